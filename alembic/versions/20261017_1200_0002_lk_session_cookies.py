@@ -0,0 +1,28 @@
+"""lk session cookies
+
+Revision ID: 0002_lk_session_cookies
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 12:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0002_lk_session_cookies"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("encrypted_lk_cookies", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("encrypted_lk_cookies")
@@ -0,0 +1,30 @@
+"""deadlines fingerprint
+
+Revision ID: 0003_deadlines_fingerprint
+Revises: 0002_lk_session_cookies
+Create Date: 2026-10-17 12:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0003_deadlines_fingerprint"
+down_revision: Union[str, None] = "0002_lk_session_cookies"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("deadlines_fingerprint", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("last_checked_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("last_checked_at")
+        batch_op.drop_column("deadlines_fingerprint")
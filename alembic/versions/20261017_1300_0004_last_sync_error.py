@@ -0,0 +1,28 @@
+"""last sync error
+
+Revision ID: 0004_last_sync_error
+Revises: 0003_deadlines_fingerprint
+Create Date: 2026-10-17 13:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0004_last_sync_error"
+down_revision: Union[str, None] = "0003_deadlines_fingerprint"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("last_sync_error", sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("last_sync_error")
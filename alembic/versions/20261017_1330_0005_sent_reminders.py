@@ -0,0 +1,41 @@
+"""sent reminders ledger
+
+Revision ID: 0005_sent_reminders
+Revises: 0004_last_sync_error
+Create Date: 2026-10-17 13:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0005_sent_reminders"
+down_revision: Union[str, None] = "0004_last_sync_error"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sent_reminders",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("deadline_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("day_offset", sa.Integer(), nullable=False),
+        sa.Column(
+            "sent_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["deadline_id"], ["deadlines.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("deadline_id", "kind", "day_offset"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sent_reminders")
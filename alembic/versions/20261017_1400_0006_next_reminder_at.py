@@ -0,0 +1,31 @@
+"""next reminder time
+
+Revision ID: 0006_next_reminder_at
+Revises: 0005_sent_reminders
+Create Date: 2026-10-17 14:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0006_next_reminder_at"
+down_revision: Union[str, None] = "0005_sent_reminders"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Время заполняется задачей напоминаний при первом запуске (пользователи с NULL берутся в расчёт сразу)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("next_reminder_at", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_users_next_reminder_at", ["next_reminder_at"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_index("ix_users_next_reminder_at")
+        batch_op.drop_column("next_reminder_at")
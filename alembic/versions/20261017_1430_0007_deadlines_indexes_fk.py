@@ -0,0 +1,47 @@
+"""deadlines indexes and foreign key
+
+Revision ID: 0007_deadlines_indexes_fk
+Revises: 0006_next_reminder_at
+Create Date: 2026-10-17 14:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0007_deadlines_indexes_fk"
+down_revision: Union[str, None] = "0006_next_reminder_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дедлайны удалённых пользователей и записи журнала по удалённым дедлайнам нарушили бы внешние ключи
+    op.execute("DELETE FROM deadlines WHERE user_id NOT IN (SELECT id FROM users)")
+    op.execute("DELETE FROM sent_reminders WHERE deadline_id NOT IN (SELECT id FROM deadlines)")
+
+    # SQLite не умеет добавлять внешний ключ в существующую таблицу - batch-режим пересоздаёт её
+    with op.batch_alter_table("deadlines", recreate="always") as batch_op:
+        batch_op.create_foreign_key(
+            "fk_deadlines_user_id_users", "users", ["user_id"], ["id"], ondelete="CASCADE"
+        )
+        batch_op.create_index("ix_deadlines_user_trashed_due", ["user_id", "is_trashed", "due_date"])
+        batch_op.create_index("ix_deadlines_user_custom", ["user_id", "is_custom"])
+        batch_op.create_index(
+            "ix_deadlines_active_due", ["due_date"], sqlite_where=sa.text("is_trashed = 0")
+        )
+        batch_op.create_index(
+            "ix_deadlines_trashed_due", ["due_date"], sqlite_where=sa.text("is_trashed = 1")
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("deadlines", recreate="always") as batch_op:
+        batch_op.drop_index("ix_deadlines_trashed_due")
+        batch_op.drop_index("ix_deadlines_active_due")
+        batch_op.drop_index("ix_deadlines_user_custom")
+        batch_op.drop_index("ix_deadlines_user_trashed_due")
+        batch_op.drop_constraint("fk_deadlines_user_id_users", type_="foreignkey")
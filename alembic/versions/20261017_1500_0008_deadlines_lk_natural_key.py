@@ -0,0 +1,63 @@
+"""deadlines natural key for LK deadlines
+
+Revision ID: 0008_deadlines_lk_natural_key
+Revises: 0007_deadlines_indexes_fk
+Create Date: 2026-10-17 15:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0008_deadlines_lk_natural_key"
+down_revision: Union[str, None] = "0007_deadlines_indexes_fk"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дубли дедлайнов из ЛК (одновременные синхронизации одного пользователя) нарушили бы уникальность.
+    # Из дублей остаётся один - лежащий в корзине, если такой есть, чтобы удалённый дедлайн не вернулся.
+    # Журнал напоминаний по дублям переносится на оставшийся дедлайн, чтобы напоминания не повторились
+    # (при совпадении с уже записанным напоминанием запись не переносится и удаляется ниже)
+    op.execute(
+        """
+        UPDATE OR IGNORE sent_reminders SET deadline_id = (
+            SELECT survivor_id FROM (
+                SELECT id, FIRST_VALUE(id) OVER (
+                    PARTITION BY user_id, course_name, task_name ORDER BY is_trashed DESC, id
+                ) AS survivor_id
+                FROM deadlines WHERE is_custom = 0
+            ) AS ranked WHERE ranked.id = sent_reminders.deadline_id
+        )
+        WHERE deadline_id IN (SELECT id FROM deadlines WHERE is_custom = 0)
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM deadlines WHERE is_custom = 0 AND id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, course_name, task_name ORDER BY is_trashed DESC, id
+                ) AS position
+                FROM deadlines WHERE is_custom = 0
+            ) WHERE position = 1
+        )
+        """
+    )
+    # Внешние ключи в миграциях не проверяются, поэтому ON DELETE CASCADE не сработал
+    op.execute("DELETE FROM sent_reminders WHERE deadline_id NOT IN (SELECT id FROM deadlines)")
+    op.create_index(
+        "uq_deadlines_user_course_task",
+        "deadlines",
+        ["user_id", "course_name", "task_name"],
+        unique=True,
+        sqlite_where=sa.text("is_custom = 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_deadlines_user_course_task", table_name="deadlines")
@@ -0,0 +1,43 @@
+"""users sync offset
+
+Revision ID: 0009_users_sync_offset
+Revises: 0008_deadlines_lk_natural_key
+Create Date: 2026-10-17 15:30:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0009_users_sync_offset"
+down_revision: Union[str, None] = "0008_deadlines_lk_natural_key"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("sync_offset", sa.Integer(), server_default="0", nullable=False))
+        batch_op.create_index("ix_users_sync_offset", ["sync_offset"])
+
+    # Смещения существующих пользователей - тот же хэш, что и в src/database/models.py (sync_offset_for)
+    connection = op.get_bind()
+    users = connection.execute(sa.text("SELECT id, telegram_id FROM users")).all()
+    if users:
+        connection.execute(
+            sa.text("UPDATE users SET sync_offset = :sync_offset WHERE id = :id"),
+            [
+                {"id": user_id, "sync_offset": zlib.crc32(str(telegram_id).encode()) % 3600}
+                for user_id, telegram_id in users
+            ],
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_index("ix_users_sync_offset")
+        batch_op.drop_column("sync_offset")
@@ -0,0 +1,41 @@
+"""users adaptive sync schedule
+
+Revision ID: 0010_users_adaptive_sync
+Revises: 0009_users_sync_offset
+Create Date: 2026-10-17 16:00:00.000000+03:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0010_users_adaptive_sync"
+down_revision: Union[str, None] = "0009_users_sync_offset"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("deadlines_changed_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("last_seen_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("next_sync_at", sa.DateTime(), nullable=True))
+
+    # История изменений существующих пользователей неизвестна - отсчёт начинается с момента миграции
+    # (NULL считался бы "не менялся никогда", и интервал сразу стал бы максимальным)
+    op.get_bind().execute(
+        sa.text("UPDATE users SET deadlines_changed_at = :now").bindparams(
+            sa.bindparam("now", datetime.now(), type_=sa.DateTime())
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("next_sync_at")
+        batch_op.drop_column("last_seen_at")
+        batch_op.drop_column("deadlines_changed_at")
@@ -0,0 +1,28 @@
+"""users reminder claim
+
+Revision ID: 0012_users_reminder_claim
+Revises: 0011_fsm_states
+Create Date: 2026-10-17 17:00:00.000000+03:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Идентификаторы ревизии, используемые Alembic.
+revision: str = "0012_users_reminder_claim"
+down_revision: Union[str, None] = "0011_fsm_states"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("reminder_claimed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("reminder_claimed_at")
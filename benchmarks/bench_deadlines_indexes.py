@@ -0,0 +1,175 @@
+"""
+Бенчмарк индексов таблицы deadlines: горячие запросы бота до и после миграции 0007.
+
+Создаёт временную БД, накатывает миграции до ревизии без индексов, заполняет её синтетическими
+пользователями и дедлайнами (по умолчанию 10 000 x 100 = миллион строк) и замеряет медианное время
+запросов. Затем накатывает миграцию с индексами, замеряет снова и проверяет по EXPLAIN QUERY PLAN,
+что ни один запрос больше не читает таблицу deadlines целиком.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_deadlines_indexes [--users N] [--per-user N] [--runs N]
+
+Запросы повторяют условия из src/database/queries.py. Для импорта конфигурации и миграций
+нужен заполненный .env (как для запуска бота); вместо DB_PATH используется временный файл.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Tuple
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Ревизия до появления индексов и ревизия с ними
+REVISION_BEFORE = "0006_next_reminder_at"
+REVISION_AFTER = "0007_deadlines_indexes_fk"
+
+# Формат, в котором SQLAlchemy хранит DATETIME в SQLite
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# (название, SQL, нужен ли случайный user_id)
+QUERIES: List[Tuple[str, str, bool]] = [
+    (
+        "Активные дедлайны пользователя",
+        "SELECT * FROM deadlines WHERE user_id = :user_id AND due_date >= :today AND is_trashed = 0 ORDER BY due_date",
+        True,
+    ),
+    (
+        "Корзина пользователя",
+        "SELECT * FROM deadlines WHERE user_id = :user_id AND is_trashed = 1 ORDER BY due_date DESC",
+        True,
+    ),
+    (
+        "Статистика пользователя",
+        "SELECT count(deadlines.id) FILTER (WHERE due_date >= :today AND is_trashed = 0), "
+        "count(deadlines.id) FILTER (WHERE due_date >= :today AND is_custom = 1 AND is_trashed = 0), "
+        "count(deadlines.id) FILTER (WHERE is_trashed = 1) "
+        "FROM users LEFT JOIN deadlines ON deadlines.user_id = users.id WHERE users.id = :user_id GROUP BY users.id",
+        True,
+    ),
+    (
+        "Синхронизация: дедлайны из ЛК",
+        "SELECT * FROM deadlines WHERE user_id = :user_id AND is_custom = 0",
+        True,
+    ),
+    (
+        "Очистка корзин",
+        "SELECT count(*) FROM deadlines WHERE is_trashed = 1 AND due_date < :today",
+        False,
+    ),
+    (
+        "Напоминания: ближайшие 7 дней",
+        "SELECT deadlines.id FROM deadlines JOIN users ON users.id = deadlines.user_id "
+        "WHERE users.notifications_enabled = 1 AND deadlines.is_trashed = 0 "
+        "AND deadlines.due_date >= :today AND deadlines.due_date < :window_end",
+        False,
+    ),
+]
+
+
+def upgrade(db_path: str, revision: str):
+    """Накатывает миграции Alembic до `revision` на БД `db_path`."""
+    from alembic import command
+    from alembic.config import Config
+    import src.config
+
+    # alembic/env.py берёт путь к БД из конфигурации проекта
+    src.config.DB_PATH = db_path
+    config = Config(str(ROOT_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT_DIR / "alembic"))
+    command.upgrade(config, revision)
+
+
+def fill(connection: sqlite3.Connection, users: int, per_user: int):
+    """Заполняет БД пользователями и дедлайнами: ~10% в корзине, ~10% личных, сроки от -60 до +120 дней."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    connection.executemany(
+        "INSERT INTO users (id, telegram_id, notifications_enabled, notification_days, notification_interval_hours, created_at) "
+        "VALUES (?, ?, 1, '1,3,7', 0, ?)",
+        ((user_id, 100_000 + user_id, today.strftime(DATETIME_FORMAT)) for user_id in range(1, users + 1)),
+    )
+
+    def rows():
+        for user_id in range(1, users + 1):
+            for number in range(per_user):
+                due_date = today + timedelta(days=random.randint(-60, 120))
+                yield (
+                    user_id, f"Дисциплина {number % 12}", f"Задание {number}",
+                    due_date.strftime(DATETIME_FORMAT), random.random() < 0.1, random.random() < 0.1,
+                )
+
+    connection.executemany(
+        "INSERT INTO deadlines (user_id, course_name, task_name, due_date, is_custom, is_trashed) VALUES (?, ?, ?, ?, ?, ?)",
+        rows(),
+    )
+    connection.commit()
+
+
+def measure(connection: sqlite3.Connection, users: int, runs: int) -> List[Tuple[float, str]]:
+    """Возвращает для каждого запроса (медиана времени в мс, план выполнения)."""
+    today = datetime.now().date()
+    results = []
+    for _, sql, per_user in QUERIES:
+        timings = []
+        for _ in range(runs):
+            params = {"today": today.isoformat(), "window_end": (today + timedelta(days=8)).isoformat()}
+            if per_user:
+                params["user_id"] = random.randint(1, users)
+            started = time.perf_counter()
+            connection.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        plan = "; ".join(row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        results.append((statistics.median(timings), plan))
+    return results
+
+
+def scans_deadlines(plan: str) -> bool:
+    """True, если план читает таблицу deadlines целиком (без индекса)."""
+    return any(
+        step.strip().startswith("SCAN deadlines") and "INDEX" not in step
+        for step in plan.split(";")
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--users", type=int, default=10_000, help="число пользователей (по умолчанию 10 000)")
+    arg_parser.add_argument("--per-user", type=int, default=100, help="дедлайнов на пользователя (по умолчанию 100)")
+    arg_parser.add_argument("--runs", type=int, default=20, help="прогонов каждого запроса (по умолчанию 20)")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = str(Path(temp_dir) / "bench.db")
+        upgrade(db_path, REVISION_BEFORE)
+        connection = sqlite3.connect(db_path)
+        started = time.perf_counter()
+        fill(connection, args.users, args.per_user)
+        print(f"Заполнено {args.users * args.per_user} дедлайнов за {time.perf_counter() - started:.1f} c")
+        before = measure(connection, args.users, args.runs)
+        connection.close()
+
+        started = time.perf_counter()
+        upgrade(db_path, REVISION_AFTER)
+        print(f"Миграция {REVISION_AFTER} выполнена за {time.perf_counter() - started:.1f} c")
+        connection = sqlite3.connect(db_path)
+        after = measure(connection, args.users, args.runs)
+        connection.close()
+
+    print(f"\n{'Запрос':<34} {'До, мс':>10} {'После, мс':>10}")
+    full_scans = []
+    for (name, _, _), (before_ms, _), (after_ms, plan) in zip(QUERIES, before, after):
+        print(f"{name:<34} {before_ms:>10.2f} {after_ms:>10.2f}    {plan}")
+        if scans_deadlines(plan):
+            full_scans.append(name)
+
+    if full_scans:
+        raise SystemExit(f"Запросы всё ещё читают deadlines целиком: {', '.join(full_scans)}")
+
+
+if __name__ == "__main__":
+    main()
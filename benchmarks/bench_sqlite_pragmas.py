@@ -0,0 +1,132 @@
+"""
+Бенчмарк профиля SQLite: чтение из хэндлеров на фоне записи планировщика.
+
+Для каждого профиля создаётся временная БД со схемой из миграций и синтетическими данными, после чего
+на async-движке (aiosqlite, как у бота) одновременно работают:
+  * писатель - транзакции в духе синхронизации с ЛК (обновление дат и вставка дедлайнов пользователя);
+  * читатели - запросы активных дедлайнов случайных пользователей, как при открытии списка в боте.
+Замеряются задержки чтения (медиана, 95-й перцентиль, максимум), число чтений и записей в секунду
+и ошибки "database is locked".
+
+Профили: исходный (rollback journal, synchronous=FULL - значения SQLite по умолчанию)
+и текущий из src/database/engine.py (SQLITE_PRAGMAS, настраивается через .env).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_sqlite_pragmas [--seconds N] [--readers N]
+
+Для импорта конфигурации и миграций нужен заполненный .env (как для запуска бота).
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.bench_deadlines_indexes import upgrade, fill, DATETIME_FORMAT
+from src.database.engine import SQLITE_PRAGMAS, set_sqlite_pragmas
+
+USERS = 1000
+DEADLINES_PER_USER = 50
+
+# Значения SQLite по умолчанию (внешние ключи включены, как и у бота)
+DEFAULT_PRAGMAS: Dict[str, object] = {"journal_mode": "DELETE", "synchronous": "FULL", "foreign_keys": "ON"}
+
+READ_SQL = text(
+    "SELECT * FROM deadlines WHERE user_id = :user_id AND due_date >= :today AND is_trashed = 0 ORDER BY due_date"
+)
+UPDATE_SQL = text("UPDATE deadlines SET due_date = :due_date WHERE user_id = :user_id AND is_custom = 0")
+INSERT_SQL = text(
+    "INSERT INTO deadlines (user_id, course_name, task_name, due_date, is_custom, is_trashed) "
+    "VALUES (:user_id, 'Дисциплина', 'Новое задание', :due_date, 0, 0)"
+)
+
+
+async def run_profile(db_path: str, pragmas: Dict[str, object], seconds: float, readers: int) -> Dict[str, float]:
+    """Нагружает БД писателем и `readers` читателями в течение `seconds` секунд и возвращает метрики."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=readers + 1)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+
+    today = datetime.now().date().isoformat()
+    deadline = time.monotonic() + seconds
+    read_latencies: List[float] = []
+    stats = {"writes": 0, "locked": 0}
+
+    async def reader():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as connection:
+                    await connection.execute(READ_SQL, {"user_id": random.randint(1, USERS), "today": today})
+            except OperationalError:
+                stats["locked"] += 1
+                continue
+            read_latencies.append((time.perf_counter() - started) * 1000)
+
+    async def writer():
+        while time.monotonic() < deadline:
+            user_id = random.randint(1, USERS)
+            due_date = (datetime.now() + timedelta(days=random.randint(1, 90))).strftime(DATETIME_FORMAT)
+            try:
+                async with engine.begin() as connection:
+                    await connection.execute(UPDATE_SQL, {"user_id": user_id, "due_date": due_date})
+                    await connection.execute(INSERT_SQL, {"user_id": user_id, "due_date": due_date})
+            except OperationalError:
+                stats["locked"] += 1
+                continue
+            stats["writes"] += 1
+
+    await asyncio.gather(writer(), *(reader() for _ in range(readers)))
+    await engine.dispose()
+
+    latencies = sorted(read_latencies)
+    return {
+        "reads_per_second": len(latencies) / seconds,
+        "writes_per_second": stats["writes"] / seconds,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        "max": latencies[-1] if latencies else 0.0,
+        "locked": stats["locked"],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--seconds", type=float, default=10, help="длительность замера на профиль (по умолчанию 10)")
+    arg_parser.add_argument("--readers", type=int, default=4, help="число одновременных читателей (по умолчанию 4)")
+    args = arg_parser.parse_args()
+
+    profiles = [("По умолчанию (DELETE, FULL)", DEFAULT_PRAGMAS), ("Профиль бота (SQLITE_PRAGMAS)", SQLITE_PRAGMAS)]
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for index, (name, pragmas) in enumerate(profiles):
+            # Режим журнала сохраняется в файле БД, поэтому у каждого профиля своя БД
+            db_path = str(Path(temp_dir) / f"profile_{index}.db")
+            upgrade(db_path, "head")
+            connection = sqlite3.connect(db_path)
+            fill(connection, USERS, DEADLINES_PER_USER)
+            connection.close()
+
+            results.append((name, asyncio.run(run_profile(db_path, pragmas, args.seconds, args.readers))))
+
+    print(f"\n{'Профиль':<32} {'Чтений/с':>9} {'Записей/с':>10} {'p50, мс':>8} {'p95, мс':>8} {'max, мс':>8} {'locked':>7}")
+    for name, result in results:
+        print(
+            f"{name:<32} {result['reads_per_second']:>9.0f} {result['writes_per_second']:>10.0f} "
+            f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['max']:>8.1f} {result['locked']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк разбора страницы заданий ЛК: время и пиковая память на одну страницу.
+
+Сравнивает исходный вариант (полное дерево BeautifulSoup на html.parser), промежуточный
+(BeautifulSoup на lxml + SoupStrainer по строкам таблицы) и текущий разбор из парсера (lxml напрямую).
+Заодно проверяет, что все варианты возвращают одинаковый список дедлайнов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_tasks_parsing [страница.html ...] [--runs N]
+
+Без аргументов используются сохранённые страницы из benchmarks/fixtures/.
+Парсер читает src/config.py, поэтому нужен заполненный .env (как для запуска бота).
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src.parser.scraper import _parse_deadlines_table
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def parse_with_soup(tasks_page_text: str, parser: str, parse_only: Optional[SoupStrainer] = None) -> List[Dict[str, str]]:
+    """Исходная реализация разбора таблицы через BeautifulSoup (до перехода на lxml)."""
+    soup = BeautifulSoup(tasks_page_text, parser, parse_only=parse_only)
+    deadlines = []
+    for row in soup.find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) < 8:
+            continue
+        subject_tag = cols[1].find('a')
+        if not subject_tag:
+            continue
+        task_tag = cols[3].find('a')
+        if not task_tag:
+            continue
+        date_text = cols[7].get_text(strip=True)
+        if not date_text or date_text == "Не указана":
+            continue
+        deadlines.append({
+            'subject': subject_tag.get_text(strip=True),
+            'task': task_tag.get_text(strip=True),
+            'due_date': date_text
+        })
+    return deadlines
+
+
+# (название варианта, функция разбора страницы)
+BACKENDS: List[tuple[str, Callable[[str], List[Dict[str, str]]]]] = [
+    ("BS4 html.parser (исходный)", lambda page: parse_with_soup(page, "html.parser")),
+    ("BS4 lxml + SoupStrainer", lambda page: parse_with_soup(page, "lxml", SoupStrainer('tr'))),
+    ("lxml (текущий)", _parse_deadlines_table),
+]
+
+
+def measure(page: str, parse: Callable[[str], List[Dict[str, str]]], runs: int) -> tuple[float, float, list]:
+    """Возвращает (медиана времени в мс, пиковая память в КБ, результат разбора)."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        parse(page)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Память меряется отдельным прогоном: tracemalloc сам по себе замедляет разбор
+    tracemalloc.start()
+    result = parse(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(timings), peak / 1024, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("pages", nargs="*", type=Path, help="сохранённые HTML-страницы заданий")
+    arg_parser.add_argument("--runs", type=int, default=20, help="число прогонов на страницу (по умолчанию 20)")
+    args = arg_parser.parse_args()
+
+    pages = args.pages or sorted(FIXTURES_DIR.glob("*.html"))
+    for path in pages:
+        page = path.read_text(encoding="utf-8")
+        print(f"\n{path.name} ({len(page) / 1024:.0f} КБ)")
+        print(f"{'Вариант':<30} {'Время, мс':>10} {'Пик памяти, КБ':>15} {'Дедлайнов':>10}")
+
+        baseline_result = None
+        for name, parse in BACKENDS:
+            median_ms, peak_kb, result = measure(page, parse, args.runs)
+            print(f"{name:<30} {median_ms:>10.2f} {peak_kb:>15.0f} {len(result):>10}")
+
+            if baseline_result is None:
+                baseline_result = result
+            elif result != baseline_result:
+                raise SystemExit(f"Вариант '{name}' вернул другой список дедлайнов, чем исходный")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 from datetime import datetime
-from typing import Union
-import asyncio
+from typing import Optional, Tuple, Union
 
 from loguru import logger
 
@@ -15,9 +14,11 @@ from src.bot.filters import InStateFilter
 from src.database.queries import *
 from src.bot.keyboards import *
 
-from src.parser.scraper import parse_lk_data, _get_current_semester_id
+from src.parser.scraper import parse_lk_data, get_deadlines_fingerprint, LkUnavailableError, _get_current_semester_id
 
-from src.scheduler.tasks import update_user_deadlines_and_notify
+from src.scheduler.tasks import start_user_update, is_user_update_running
+from src.bot.outbox import Outbox
+from src.bot.progress import SyncProgress, SYNC_PHASE_TEXTS
 
 
 # Создание роутера (нужен для организации хэндлеров)
@@ -78,8 +79,11 @@ async def cmd_help(message: types.Message):
 
 
 @router.message(Command("update"))
-async def cmd_update(message: types.Message, state: FSMContext, bot: Bot):
-    """Обработчик команды /update, обновляет дедлайны пользователя"""
+async def cmd_update(message: types.Message, state: FSMContext, bot: Bot, outbox: Outbox):
+    """
+    Обработчик команды /update, обновляет дедлайны пользователя.
+    Сразу отвечает сообщением о ходе обновления, а сама синхронизация с ЛК идёт в фоне (см. start_user_update).
+    """
     if not message.from_user:
         logger.warning(f"Пользователь {message.from_user} не найден при попытке обновить дедлайны")
         return
@@ -89,8 +93,12 @@ async def cmd_update(message: types.Message, state: FSMContext, bot: Bot):
         await message.answer("⛔ Не удалось обновить дедлайны, вы не авторизованы в личный кабинет!")
         await start_login(bot, user_id, state)
         return
-    await update_user_deadlines_and_notify(bot, user_id, force_notify=True)
-    logger.info(f"Пользователь {user_id} обновил дедлайны с помощью команды '/update'")
+    if is_user_update_running(user_id):
+        await message.answer("⏳ Дедлайны уже обновляются, итог появится в сообщении выше.")
+        return
+    status_message = await message.answer(SYNC_PHASE_TEXTS["queued"])
+    start_user_update(outbox, SyncProgress(outbox, user_id, status_message))
+    logger.info(f"Пользователь {user_id} запустил обновление дедлайнов с помощью команды '/update'")
 
 
 async def start_login(bot: Bot, chat_id: int, state: FSMContext):
@@ -142,10 +150,19 @@ async def process_password(message: types.Message, state: FSMContext):
     msg_to_delete = await message.answer("🔐 Пытаюсь войти в личный кабинет, это может занять минуту...")
     await message.bot.send_chat_action(chat_id=message.chat.id, action="typing")  # Показ "печатает..."
 
-    # Парсер - синхронный (использует requests), а бот - асинхронный
-    # Поэтому запуск парсера происходит в отдельном потоке, чтобы не блокировать бота
-    loop = asyncio.get_event_loop()
-    parsed_data = await loop.run_in_executor(None, parse_lk_data, login, password)
+    # Парсер асинхронный (aiohttp), поэтому ожидание ответа ЛК не блокирует бота
+    try:
+        parsed_data = await parse_lk_data(login, password, interactive=True)
+    except LkUnavailableError:
+        await msg_to_delete.delete()
+        await message.answer(
+            "⏳ Личный кабинет ГУАП сейчас не отвечает, поэтому войти не получилось.\n"
+            "🔁 Попробуй чуть позже: отправь логин ещё раз.",
+            reply_markup=get_cancel_keyboard()
+        )
+        await state.set_state(Registration.waiting_for_login)
+        logger.info(f"Пользователь {message.from_user.id} не смог войти: ЛК недоступен")
+        return
 
     await msg_to_delete.delete()  # Удаление сообщения от бота "Пытаюсь войти ..."
 
@@ -159,14 +176,15 @@ async def process_password(message: types.Message, state: FSMContext):
         logger.info(f"Пользователь {message.from_user.id} получил ошибку при входе")
         return
 
-    new_parsed_deadlines, profile_id, full_name = parsed_data
+    new_parsed_deadlines, profile_id, full_name, lk_cookies = parsed_data
 
     await set_user_credentials(
         telegram_id=message.from_user.id,
         login=login,
         password=password,
         profile_id=profile_id,
-        full_name=full_name
+        full_name=full_name,
+        lk_cookies=lk_cookies
     )
 
     # Завершение регистрации
@@ -181,7 +199,11 @@ async def process_password(message: types.Message, state: FSMContext):
     logger.info(f"Пользователь {message.from_user.id} успешно авторизовался")
 
     if new_parsed_deadlines:
-        await update_user_deadlines(message.from_user.id, new_parsed_deadlines)
+        await update_user_deadlines(
+            message.from_user.id,
+            new_parsed_deadlines,
+            get_deadlines_fingerprint(new_parsed_deadlines)
+        )
         deadlines_text = "\n\n".join(
             [f"📚 <b>{d['subject']}</b>\n"
              f"📝 <b>Задание:</b> {d['task']}\n"
@@ -196,19 +218,34 @@ async def process_password(message: types.Message, state: FSMContext):
 # -------------------------------------------------------------------------------------------
 # Основные команды меню
 
-4
-def format_deadlines_page(deadlines: list, page: int, page_size: int = 5) -> str:
+async def load_deadlines_page(
+    telegram_id: int,
+    page: int = 0,
+    after: Optional[DeadlineCursor] = None,
+    before: Optional[DeadlineCursor] = None,
+    trashed: bool = False
+) -> Tuple[list, int, int]:
     """
-    Формирует текст одной страницы со списком дедлайнов.
-    Функция предполагает, что список `deadlines` не пустой.
+    Загружает страницу дедлайнов (или корзины) по курсору из кнопки и возвращает (дедлайны, номер страницы, всего).
+    Если список изменился с момента показа страницы и по курсору её уже не собрать, показывается первая страница.
     """
-    start_index = page * page_size
-    end_index = start_index + page_size
+    deadlines, total = await get_deadlines_page(telegram_id, trashed, PAGE_SIZE, after=after, before=before)
+    if (after or before) and (not deadlines or (before and len(deadlines) < PAGE_SIZE)):
+        deadlines, total = await get_deadlines_page(telegram_id, trashed, PAGE_SIZE)
+        page = 0
+
+    # Номер страницы только для отображения: после удалений он может "съехать" за последнюю страницу
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    return deadlines, min(page, max(total_pages - 1, 0)), total
 
-    page_deadlines = deadlines[start_index:end_index]
 
+def format_deadlines_page(deadlines: list, page: int, page_size: int = 5) -> str:
+    """
+    Формирует текст одной страницы со списком дедлайнов (`deadlines` - дедлайны этой страницы).
+    Функция предполагает, что список `deadlines` не пустой.
+    """
     deadlines_text = "⏳ <b>Ваши актуальные дедлайны:</b>\n\n"
-    for i, d in enumerate(page_deadlines, start=start_index + 1):
+    for i, d in enumerate(deadlines, start=page * page_size + 1):
         deadlines_text += (
             f"{i}.📚 <b>{d.course_name}</b>\n"
             f"   📝 <b>Задание:</b> {d.task_name}\n"
@@ -222,7 +259,7 @@ def format_deadlines_page(deadlines: list, page: int, page_size: int = 5) -> str
 @router.message(F.text == "🚨 Посмотреть дедлайны")
 async def show_deadlines(message: types.Message):
     """Показывает первую страницу со списком дедлайнов."""
-    deadlines = await get_user_deadlines_from_db(message.from_user.id)
+    deadlines, _, total = await load_deadlines_page(message.from_user.id)
     if not deadlines:
         await message.answer(
             "🕳 У вас пока нет предстоящих дедлайнов в базе.\n"
@@ -233,12 +270,12 @@ async def show_deadlines(message: types.Message):
         )
         return
 
-    total_pages = (len(deadlines) + PAGE_SIZE - 1) // PAGE_SIZE
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
     page_text = format_deadlines_page(deadlines, page=0, page_size=PAGE_SIZE)
 
     await message.answer(
         page_text,
-        reply_markup=get_pagination_keyboard(current_page=0, total_pages=total_pages),
+        reply_markup=get_pagination_keyboard(deadlines, current_page=0, total_pages=total_pages),
         parse_mode="HTML"
     )
 
@@ -247,9 +284,8 @@ async def show_deadlines(message: types.Message):
 
 # Кнопка "Мой профиль"
 @router.message(F.text == "👤 Мой профиль")
-async def show_profile(message: types.Message):
+async def show_profile(message: types.Message, user: User | None):
     stats = await get_user_stats(message.from_user.id)
-    user = await get_user_by_telegram_id(message.from_user.id)
     _, semester_name = _get_current_semester_id()
 
     if not stats or not user:
@@ -305,8 +341,7 @@ async def cmd_stop(message: types.Message):
 
 # Кнопка "Настройка напоминаний"
 @router.message(F.text == "🔔 Настройка напоминаний")
-async def settings_notifications_menu(message: types.Message):
-    user = await get_user_by_telegram_id(message.from_user.id)
+async def settings_notifications_menu(message: types.Message, user: User | None):
     if not user:
         logger.warning(f"Пользователь {message.from_user.id} не найден в базе данных при попытке настроить уведомления")
         await message.answer("⛔ Не удалось найти ваш профиль. Попробуйте /start.")
@@ -322,7 +357,7 @@ async def settings_notifications_menu(message: types.Message):
 
 async def update_notification_settings_menu(callback: CallbackQuery):
     """Вспомогательная функция для обновления меню настроек."""
-    user = await get_user_by_telegram_id(callback.from_user.id)
+    user = await get_cached_user(callback.from_user.id)
     if not user:
         await callback.answer("⛔ Произошла ошибка, не могу найти ваш профиль.")
         return
@@ -340,7 +375,7 @@ async def update_notification_settings_menu(callback: CallbackQuery):
 # Кнопка "Настройка дедлайнов"
 @router.message(F.text == "🛠️ Настройка дедлайнов")
 async def settings_deadlines_menu(message: types.Message):
-    deadlines = await get_user_deadlines_from_db(message.from_user.id)
+    deadlines, _, total = await load_deadlines_page(message.from_user.id)
 
     await message.answer(
         "🔧 Здесь вы можете управлять дедлайнами:\n"
@@ -348,6 +383,7 @@ async def settings_deadlines_menu(message: types.Message):
         reply_markup=get_deadlines_settings_keyboard(
             deadlines,
             current_page=0,
+            total_count=total,
             page_size=PAGE_SIZE,
             user_id=message.from_user.id
         )
@@ -368,34 +404,34 @@ async def deadlines_page_callback(callback: CallbackQuery):
         logger.error("Не удалось обработать callback-запрос для обработки страницы с callback_id={callback.id}")
         return
 
-    page = int(callback.data.split("_")[1])
+    page, after, before = parse_page_callback_data(callback.data, "page")
 
-    deadlines = await get_user_deadlines_from_db(callback.from_user.id)
+    deadlines, page, total = await load_deadlines_page(callback.from_user.id, page, after, before)
     if not deadlines:
         await callback.message.edit_text("🕳 Дедлайнов больше нет.")
         await callback.answer()
         return
 
-    total_pages = (len(deadlines) + PAGE_SIZE - 1) // PAGE_SIZE
+    total_pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
     page_text = format_deadlines_page(deadlines, page=page, page_size=PAGE_SIZE)
 
     await callback.message.edit_text(
         page_text,
-        reply_markup=get_pagination_keyboard(current_page=page, total_pages=total_pages),
+        reply_markup=get_pagination_keyboard(deadlines, current_page=page, total_pages=total_pages),
         parse_mode="HTML"
     )
     await callback.answer()
 
 
 async def check_lk_auth(user_id: int):
-    user = await get_user_by_telegram_id(user_id)
+    user = await get_cached_user(user_id)
     if not user:
         return False
     return bool(user.encrypted_login_lk and user.encrypted_password_lk)
 
 
 @router.callback_query(F.data.startswith("update_"))
-async def update_deadlines_callback(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def update_deadlines_callback(callback: CallbackQuery, state: FSMContext, bot: Bot, outbox: Outbox):
     """
     Хендлер, обрабатывающий кнопку обновления дедлайнов.
     """
@@ -407,8 +443,12 @@ async def update_deadlines_callback(callback: CallbackQuery, state: FSMContext,
         await callback.answer("⛔ Не удалось обновить дедлайны, вы не авторизованы в личный кабинет!")
         await start_login(bot, user_id, state)
         return
-    await update_user_deadlines_and_notify(bot, user_id, force_notify=True)
-    await callback.answer()
+    if is_user_update_running(user_id):
+        await callback.answer("⏳ Дедлайны уже обновляются")
+        return
+    # Нажатие подтверждается сразу, сообщение о ходе обновления отправит фоновая задача
+    await callback.answer(SYNC_PHASE_TEXTS["queued"])
+    start_user_update(outbox, SyncProgress(outbox, user_id))
 
 
 @router.callback_query(F.data.startswith("settings_page_"))
@@ -419,13 +459,14 @@ async def settings_page_callback(callback: CallbackQuery):
     if not callback.data or not callback.message:
         logger.error("Не удалось обработать callback-запрос для обработки переключения страниц в меню настройки дедлайнов")
         return
-    page = int(callback.data.split("_")[2])
-    deadlines = await get_user_deadlines_from_db(callback.from_user.id)
+    page, after, before = parse_page_callback_data(callback.data, "settings_page")
+    deadlines, page, total = await load_deadlines_page(callback.from_user.id, page, after, before)
 
     await callback.message.edit_reply_markup(
         reply_markup=get_deadlines_settings_keyboard(
             deadlines,
             current_page=page,
+            total_count=total,
             page_size=PAGE_SIZE,
             user_id=callback.from_user.id
         )
@@ -530,12 +571,13 @@ async def confirm_delete_deadline_callback(callback: CallbackQuery):
     await move_deadline_to_trash(deadline_id)
 
     # Обновление исходного меню настроек, чтобы показать исчезновение дедлайна
-    deadlines = await get_user_deadlines_from_db(callback.from_user.id)
+    deadlines, _, total = await load_deadlines_page(callback.from_user.id)
     await callback.message.edit_text(
         "🚮 Дедлайн перемещён в корзину. Вот обновленный список:",
         reply_markup=get_deadlines_settings_keyboard(
             deadlines,
             current_page=0,  # Возврат на первую страницу
+            total_count=total,
             page_size=PAGE_SIZE,
             user_id=callback.from_user.id
         )
@@ -550,12 +592,13 @@ async def cancel_delete_deadline_callback(callback: CallbackQuery):
     Хендлер, который срабатывает при отмене удаления, возвращая пользователя
     в меню настроек дедлайнов.
     """
-    deadlines = await get_user_deadlines_from_db(callback.from_user.id)
+    deadlines, _, total = await load_deadlines_page(callback.from_user.id)
     await callback.message.edit_text(
         "❕ Удаление отменено. Вы снова в меню управления дедлайнами.",
         reply_markup=get_deadlines_settings_keyboard(
             deadlines,
             current_page=0,  # Возврат на первую страницу
+            total_count=total,
             page_size=PAGE_SIZE,
             user_id=callback.from_user.id
         )
@@ -619,9 +662,14 @@ async def on_cancel_delete_all_custom(callback: CallbackQuery):
 # -------------------------------------------------------------------------------------------
 # Управление корзиной
 
-async def show_trash_bin(callback: CallbackQuery, page: int = 0):
-    """Вспомогательная функция для отображения содержимого корзины."""
-    trashed_deadlines = await get_trashed_deadlines_from_db(callback.from_user.id)
+async def show_trash_bin(
+    callback: CallbackQuery,
+    page: int = 0,
+    after: Optional[DeadlineCursor] = None,
+    before: Optional[DeadlineCursor] = None
+):
+    """Вспомогательная функция для отображения содержимого корзины (страница `page`, по умолчанию первая)."""
+    trashed_deadlines, page, total = await load_deadlines_page(callback.from_user.id, page, after, before, trashed=True)
     if not trashed_deadlines:
         text = "🗑️ Корзина пуста."
     else:
@@ -629,7 +677,7 @@ async def show_trash_bin(callback: CallbackQuery, page: int = 0):
 
     await callback.message.edit_text(
         text,
-        reply_markup=get_trash_bin_keyboard(trashed_deadlines, current_page=page, page_size=PAGE_SIZE)
+        reply_markup=get_trash_bin_keyboard(trashed_deadlines, current_page=page, total_count=total, page_size=PAGE_SIZE)
     )
 
 
@@ -642,8 +690,8 @@ async def open_trash_bin_callback(callback: CallbackQuery):
 
 @router.callback_query(F.data.startswith("trash_page_"))
 async def trash_page_callback(callback: CallbackQuery):
-    page = int(callback.data.split("_")[2])
-    await show_trash_bin(callback, page=page)
+    page, after, before = parse_page_callback_data(callback.data, "trash_page")
+    await show_trash_bin(callback, page, after, before)
     await callback.answer()
     logger.info(f"Пользователь {callback.from_user.id} переключил страницу корзины на {page}")
 
@@ -684,10 +732,10 @@ async def empty_trash_confirmed_callback(callback: CallbackQuery):
 @router.callback_query(F.data == "back_to_settings")
 async def back_to_settings_callback(callback: CallbackQuery):
     """Функция 'симулирует' нажатие на кнопку 'Настройка дедлайнов', чтобы вернуться в предыдущее меню."""
-    deadlines = await get_user_deadlines_from_db(callback.from_user.id)
+    deadlines, _, total = await load_deadlines_page(callback.from_user.id)
     await callback.message.edit_text(
         "🔧 Здесь вы можете управлять дедлайнами:",
-        reply_markup=get_deadlines_settings_keyboard(deadlines, 0, PAGE_SIZE, callback.from_user.id)
+        reply_markup=get_deadlines_settings_keyboard(deadlines, 0, total, PAGE_SIZE, callback.from_user.id)
     )
     await callback.answer()
     logger.info(f"Пользователь {callback.from_user.id} вернулся в настройки дедлайнов")
@@ -722,7 +770,7 @@ async def set_interval_hours(message: types.Message, state: FSMContext):
     await state.clear()
 
     # Обновление меню, чтобы пользователь увидел изменения
-    user = await get_user_by_telegram_id(message.from_user.id)
+    user = await get_cached_user(message.from_user.id)
     if user:
         await message.answer(
             "✅ Настройки сохранены!",
@@ -1,7 +1,39 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from src.database.models import User
+from src.database.models import User, Deadline, REMINDER_DAY_OPTIONS
+
+# Формат срока сдачи в курсоре страницы (callback_data ограничена 64 байтами)
+CURSOR_DATE_FORMAT = "%Y%m%d%H%M%S"
+
+
+def page_callback_data(prefix: str, page: int, deadline: Deadline, forward: bool) -> str:
+    """
+    Формирует callback_data кнопки перехода на страницу `page` списка дедлайнов.
+    Кроме номера страницы в неё кладётся курсор - срок сдачи и id крайнего дедлайна текущей страницы
+    (последнего для "Вперёд", первого для "Назад"), от которого запрос продолжит список.
+    """
+    direction = "n" if forward else "p"
+    return f"{prefix}_{page}_{direction}_{deadline.due_date.strftime(CURSOR_DATE_FORMAT)}_{deadline.id}"
+
+
+def parse_page_callback_data(data: str, prefix: str) -> Tuple[int, Optional[Tuple[datetime, int]], Optional[Tuple[datetime, int]]]:
+    """
+    Разбирает callback_data из page_callback_data: возвращает (номер страницы, курсор after, курсор before).
+    Первая страница и кнопки старого формата (без курсора) открывают список с начала.
+    """
+    parts = data[len(prefix) + 1:].split("_")
+    if len(parts) != 4 or int(parts[0]) <= 0:
+        return 0, None, None
+
+    page, direction, due_date, deadline_id = parts
+    cursor = (datetime.strptime(due_date, CURSOR_DATE_FORMAT), int(deadline_id))
+    if direction == "n":
+        return int(page), cursor, None
+    return int(page), None, cursor
 
 
 def get_main_menu_keyboard():
@@ -58,19 +90,21 @@ def get_cancel_keyboard():
     return keyboard
 
 
-def get_deadlines_settings_keyboard(deadlines: list, current_page: int, page_size: int, user_id: int):
+def get_deadlines_settings_keyboard(
+    page_deadlines: list,
+    current_page: int,
+    total_count: int,
+    page_size: int,
+    user_id: int
+):
     """
     Создаёт пагинированную клавиатуру для удаления дедлайнов.
+    `page_deadlines` - дедлайны текущей страницы, `total_count` - сколько их всего.
     Каждый дедлайн - это кнопка для его удаления.
     """
     builder = InlineKeyboardBuilder()
 
-    total_pages = (len(deadlines) + page_size - 1) // page_size
-
-    # "Нарезка" списка дедлайнов для текущей страницы
-    start_index = current_page * page_size
-    end_index = start_index + page_size
-    page_deadlines = deadlines[start_index:end_index]
+    total_pages = (total_count + page_size - 1) // page_size
 
     # Создание кнопок для удаления дедлайнов
     for deadline in page_deadlines:
@@ -86,17 +120,19 @@ def get_deadlines_settings_keyboard(deadlines: list, current_page: int, page_siz
 
     pagination_buttons = []
     if current_page > 0:
-        pagination_buttons.append(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data=f"settings_page_{current_page - 1}")
-        )
+        pagination_buttons.append(InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=page_callback_data("settings_page", current_page - 1, page_deadlines[0], forward=False)
+        ))
     if total_pages > 1:
         pagination_buttons.append(
             InlineKeyboardButton(text=f"📄 {current_page + 1}/{total_pages}", callback_data="ignore")
         )
     if current_page < total_pages - 1:
-        pagination_buttons.append(
-            InlineKeyboardButton(text="Вперед ➡️", callback_data=f"settings_page_{current_page + 1}")
-        )
+        pagination_buttons.append(InlineKeyboardButton(
+            text="Вперед ➡️",
+            callback_data=page_callback_data("settings_page", current_page + 1, page_deadlines[-1], forward=True)
+        ))
 
     # Если кнопок пагинации больше нуля, то они добавляются в ряд
     if pagination_buttons:
@@ -132,10 +168,8 @@ def get_notification_settings_keyboard(user: User):
 
     # Кнопки для дней уведомлений
     user_days = set(map(int, user.notification_days.split(','))) if user.notification_days else set()
-    possible_days = [1, 3, 7]
-
     day_buttons = []
-    for day in possible_days:
+    for day in REMINDER_DAY_OPTIONS:
         text = f"✅ за {day} д." if day in user_days else f"🔕 за {day} д."
         day_buttons.append(InlineKeyboardButton(text=text, callback_data=f"toggle_day_{day}"))
 
@@ -144,22 +178,28 @@ def get_notification_settings_keyboard(user: User):
     return builder.as_markup()
 
 
-def get_pagination_keyboard(current_page: int, total_pages: int):
+def get_pagination_keyboard(page_deadlines: list, current_page: int, total_pages: int):
     """
-    Создаёт клавиатуру для пагинации (Вперёд/Назад).
+    Создаёт клавиатуру для пагинации (Вперёд/Назад) списка дедлайнов, `page_deadlines` - дедлайны текущей страницы.
     """
     builder = InlineKeyboardBuilder()
 
     # Кнопка "Назад" не показывается, если это первая страница
     if current_page > 0:
-        builder.button(text="⬅️ Назад", callback_data=f"page_{current_page - 1}")
+        builder.button(
+            text="⬅️ Назад",
+            callback_data=page_callback_data("page", current_page - 1, page_deadlines[0], forward=False)
+        )
 
     # Индикатор страницы ('ignore' - чтобы нажатие на кнопку не делало ничего)
     builder.button(text=f"📄 {current_page + 1} / {total_pages}", callback_data="ignore")
 
     # Кнопка "Вперёд" не показывается, если это последняя страница
     if current_page < total_pages - 1:
-        builder.button(text="Вперёд ➡️", callback_data=f"page_{current_page + 1}")
+        builder.button(
+            text="Вперёд ➡️",
+            callback_data=page_callback_data("page", current_page + 1, page_deadlines[-1], forward=True)
+        )
 
     # Расположение кнопок в один ряд
     builder.adjust(3)
@@ -175,14 +215,13 @@ def get_update_button(user_id: int):
     return builder.as_markup()
 
 
-def get_trash_bin_keyboard(deadlines: list, current_page: int, page_size: int):
-    """Создаёт пагинированную клавиатуру для корзины."""
+def get_trash_bin_keyboard(page_deadlines: list, current_page: int, total_count: int, page_size: int):
+    """
+    Создаёт пагинированную клавиатуру для корзины.
+    `page_deadlines` - дедлайны текущей страницы, `total_count` - сколько их в корзине всего.
+    """
     builder = InlineKeyboardBuilder()
-    total_pages = (len(deadlines) + page_size - 1) // page_size
-
-    start_index = current_page * page_size
-    end_index = start_index + page_size
-    page_deadlines = deadlines[start_index:end_index]
+    total_pages = (total_count + page_size - 1) // page_size
 
     # Кнопки для восстановления
     for deadline in page_deadlines:
@@ -193,17 +232,21 @@ def get_trash_bin_keyboard(deadlines: list, current_page: int, page_size: int):
 
     pagination_buttons = []
     if current_page > 0:
-        pagination_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"trash_page_{current_page - 1}"))
+        pagination_buttons.append(InlineKeyboardButton(
+            text="⬅️", callback_data=page_callback_data("trash_page", current_page - 1, page_deadlines[0], forward=False)
+        ))
     if total_pages > 1:
         pagination_buttons.append(InlineKeyboardButton(text=f"📄 {current_page + 1}/{total_pages}", callback_data="ignore"))
     if current_page < total_pages - 1:
-        pagination_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"trash_page_{current_page + 1}"))
+        pagination_buttons.append(InlineKeyboardButton(
+            text="➡️", callback_data=page_callback_data("trash_page", current_page + 1, page_deadlines[-1], forward=True)
+        ))
     
     if pagination_buttons:
         builder.row(*pagination_buttons)
 
     # Кнопки действий
-    if deadlines: # Показ кнопки "Очистить", только если корзина не пуста
+    if total_count: # Показ кнопки "Очистить", только если корзина не пуста
          builder.row(InlineKeyboardButton(text="💥 Очистить корзину 💥", callback_data="empty_trash"))
     builder.row(InlineKeyboardButton(text="⬅️ Назад в настройки", callback_data="back_to_settings"))
 
@@ -1,14 +1,17 @@
 from src.bot.handlers import router as main_router
+from src.bot.middlewares import UserContextMiddleware
+from src.bot.outbox import Outbox
+from src.bot.storage import DatabaseStorage
 from src.config import BOT_TOKEN, ADMIN_ID
 
+from src.utils.concurrency import shutdown_parse_executor
 from src.utils.logging import init_logger
 from src.scheduler.tasks import (
-    update_all_deadlines, send_deadline_notifications,
-    cleanup_expired_trashed_deadlines_task
+    update_deadlines_slice, send_deadline_notifications, SYNC_SLICE_SECONDS,
+    cleanup_expired_trashed_deadlines_task, refresh_all_profiles
 )
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from aiogram import Bot, Dispatcher
 
@@ -44,26 +47,38 @@ async def main():
     # Инициализция команд для бота
     await set_main_menu_commands(bot)
 
-    # Диспетчер, принимащий апдейты от Telegram и передающий их хэндлерам
-    dp = Dispatcher(storage=MemoryStorage())
+    # Очередь исходящих сообщений: через неё идут все рассылки планировщика и ответы на /update
+    outbox = Outbox(bot)
+    outbox.start()
+
+    # Диспетчер, принимащий апдейты от Telegram и передающий их хэндлерам (outbox доступен хэндлерам как аргумент).
+    # Состояния диалогов хранятся в БД и не теряются при перезапуске
+    dp = Dispatcher(storage=DatabaseStorage(), outbox=outbox)
     dp.include_router(main_router)
 
+    # Пользователь из БД передаётся хэндлерам сообщений и кнопок аргументом `user`
+    dp.message.middleware(UserContextMiddleware())
+    dp.callback_query.middleware(UserContextMiddleware())
+
     # Инициализиация планировщика
     scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
 
-    # Добавление задачи на обновление дедлайнов
-    scheduler.add_job(update_all_deadlines, trigger='interval', hours=1, args=(bot,))
+    # Добавление задачи на обновление дедлайнов (каждый пользователь - раз в час, небольшими частями в течение часа)
+    scheduler.add_job(update_deadlines_slice, trigger='interval', seconds=SYNC_SLICE_SECONDS, args=(outbox,))
 
-    # Добавление задачи на отправку уведомлений
-    scheduler.add_job(send_deadline_notifications, trigger='interval', hours=1, args=(bot,))
+    # Добавление задачи на отправку уведомлений (каждую минуту, но обрабатываются только те, кому пора напомнить)
+    scheduler.add_job(send_deadline_notifications, trigger='cron', minute='*', args=(outbox,))
 
-    # Добавление задачи на очистку просроченных дедлайнов из корзин (один раз, в 6 часов утра)
+    # Добавление задачи на очистку просроченных дедлайнов из корзин и брошенных диалогов (один раз, в 6 часов утра)
     scheduler.add_job(cleanup_expired_trashed_deadlines_task, trigger='cron', hour=6)
 
+    # Добавление задачи на обновление ФИО и ID профилей (раз в семестр: 1 сентября и 1 февраля)
+    scheduler.add_job(refresh_all_profiles, trigger='cron', month='2,9', day=1, hour=5)
+
     """
     ### Тест системы уведомлений
     await asyncio.sleep(2)
-    await send_deadline_notifications(bot)
+    await send_deadline_notifications(outbox)
     """
 
     # Запуск планировщика
@@ -73,7 +88,9 @@ async def main():
     try:
         await dp.start_polling(bot)
     finally:
+        await outbox.stop()
         await bot.session.close()
+        shutdown_parse_executor()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TelegramUser
+
+from src.database.queries import get_cached_user, touch_user_activity
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Один раз за апдейт находит пользователя бота (строку users) и передаёт его хэндлеру аргументом `user`.
+
+    Пользователь берётся из кэша (см. get_cached_user), поэтому повторные нажатия кнопок не обращаются к БД.
+    Ищется только для хэндлеров, которые принимают аргумент `user`; для незарегистрированных - None.
+    Заодно отмечает активность пользователя (см. touch_user_activity) - от неё зависит частота синхронизации с ЛК.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user: TelegramUser | None = data.get("event_from_user")
+        handler_object = data.get("handler")
+        wants_user = handler_object is not None and (handler_object.varkw or "user" in handler_object.params)
+        if from_user:
+            await touch_user_activity(from_user.id)
+        if from_user and wants_user:
+            data["user"] = await get_cached_user(from_user.id)
+        return await handler(event, data)
@@ -0,0 +1,137 @@
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramNetworkError, TelegramServerError, TelegramForbiddenError
+)
+from aiogram.types import Message
+from loguru import logger
+
+from typing import Dict, List, Optional
+import itertools
+import asyncio
+import time
+
+from src.config import OUTBOX_RATE, OUTBOX_CHAT_INTERVAL, OUTBOX_WORKERS, OUTBOX_MAX_RETRIES
+from src.utils.ratelimit import TokenBucket
+
+# Приоритеты очереди: ответы на действия пользователя (/update) обгоняют плановые рассылки
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Базовая пауза перед повтором отправки после сетевой ошибки (в секундах), растёт экспоненциально
+RETRY_BACKOFF = 1.0
+
+# При каком числе отслеживаемых чатов удалять из памяти те, в которые давно ничего не отправлялось
+CHAT_SLOTS_CLEANUP_SIZE = 10_000
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений бота.
+
+    Соблюдает общий лимит Telegram (OUTBOX_RATE сообщений в секунду) и интервал между сообщениями
+    в один чат, при флуд-контроле (TelegramRetryAfter) приостанавливает всю отправку на указанное время,
+    сетевые ошибки и ошибки сервера повторяет. Сообщение не теряется из-за временных сбоев:
+    отказ возможен только после OUTBOX_MAX_RETRIES повторов или при постоянной ошибке (бот заблокирован и т.п.).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = OUTBOX_RATE,
+        chat_interval: float = OUTBOX_CHAT_INTERVAL,
+        workers: int = OUTBOX_WORKERS,
+        max_retries: int = OUTBOX_MAX_RETRIES
+    ):
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self._workers_count = workers
+        self._rate_limiter = TokenBucket(rate=rate, capacity=max(1, int(rate)))
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()  # Порядок отправки внутри одного приоритета
+        self._chat_next_at: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def qsize(self) -> int:
+        """Число сообщений, ожидающих отправки."""
+        return self._queue.qsize()
+
+    def start(self):
+        """Запускает воркеры отправки (внутри работающего event loop)."""
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+        logger.info(f"Очередь отправки запущена: воркеров {self._workers_count}")
+
+    async def stop(self, timeout: float = 30):
+        """Дожидается отправки накопленных сообщений (не дольше `timeout` секунд) и останавливает воркеры."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Очередь отправки остановлена, не отправлено сообщений: {self.qsize}")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def send(self, chat_id: int, text: str, interactive: bool = False, **kwargs) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь и сразу возвращает future с результатом отправки:
+        отправленное Message или None, если сообщение доставить не удалось (причина пишется в лог).
+        Дополнительные аргументы передаются в Bot.send_message (parse_mode, reply_markup, ...).
+        """
+        future = asyncio.get_running_loop().create_future()
+        priority = PRIORITY_INTERACTIVE if interactive else PRIORITY_BACKGROUND
+        self._queue.put_nowait((priority, next(self._sequence), chat_id, text, kwargs, future))
+        return future
+
+    async def _worker(self):
+        while True:
+            _, _, chat_id, text, kwargs, future = await self._queue.get()
+            try:
+                message = await self._deliver(chat_id, text, kwargs)
+            except TelegramForbiddenError:
+                message = None
+                logger.warning(f"Сообщение пользователю {chat_id} не доставлено: бот заблокирован")
+            except Exception as e:
+                message = None
+                logger.error(f"Не удалось отправить сообщение пользователю {chat_id}. Ошибка: {e}")
+            finally:
+                self._queue.task_done()
+            if not future.done():
+                future.set_result(message)
+
+    async def _deliver(self, chat_id: int, text: str, kwargs: dict) -> Optional[Message]:
+        """Отправляет сообщение, дожидаясь своей очереди и повторяя попытку при временных сбоях."""
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id)
+            try:
+                return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            except TelegramRetryAfter as e:
+                # Флуд-контроль действует на весь бот: пауза для всех воркеров, попытка не считается неудачной
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logger.warning(f"Флуд-контроль Telegram: отправка приостановлена на {e.retry_after} c, в очереди {self.qsize}")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Сбой отправки пользователю {chat_id} ({e}), повтор {attempt}/{self.max_retries}")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    async def _wait_turn(self, chat_id: int):
+        """Ждёт окна для отправки в чат `chat_id`, окончания флуд-контроля и токена общего лимита."""
+        now = time.monotonic()
+        if len(self._chat_next_at) > CHAT_SLOTS_CLEANUP_SIZE:
+            self._chat_next_at = {chat: at for chat, at in self._chat_next_at.items() if at > now}
+
+        # Время отправки в чат резервируется сразу, поэтому сообщения одному пользователю уходят по порядку
+        slot = max(now, self._chat_next_at.get(chat_id, 0.0))
+        self._chat_next_at[chat_id] = slot + self.chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self._rate_limiter.acquire()
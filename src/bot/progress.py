@@ -0,0 +1,71 @@
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message
+from loguru import logger
+
+from typing import Optional
+import asyncio
+
+from src.bot.outbox import Outbox
+
+# Этапы синхронизации с ЛК, о которых сообщается пользователю (см. SyncProgress.phase)
+SYNC_PHASE_TEXTS = {
+    "queued": "⏳ Обновляю дедлайны…",
+    "connect": "🔌 Подключаюсь к личному кабинету…",
+    "login": "🔐 Вхожу в личный кабинет…",
+    "parse": "📥 Получаю дедлайны из личного кабинета…",
+    "save": "💾 Сохраняю дедлайны…",
+}
+
+
+class SyncProgress:
+    """
+    Сообщение о ходе обновления дедлайнов по запросу пользователя: одно сообщение, которое
+    редактируется по мере прохождения этапов синхронизации и в конце показывает её итог.
+
+    Если сообщение ещё не отправлено (кнопка "Обновить" отвечает на нажатие всплывающим уведомлением),
+    оно отправляется через очередь Outbox при первом обновлении. Обновления не ждут Telegram:
+    пока предыдущее редактирование не завершилось, промежуточные этапы схлопываются до последнего.
+    """
+
+    def __init__(self, outbox: Outbox, chat_id: int, message: Optional[Message] = None):
+        self.outbox = outbox
+        self.chat_id = chat_id
+        self._message = message
+        self._shown = message.text if message else None
+        self._text: Optional[str] = None
+        self._parse_mode: Optional[str] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def phase(self, name: str):
+        """Показывает этап синхронизации (ключ SYNC_PHASE_TEXTS)."""
+        self.update(SYNC_PHASE_TEXTS[name])
+
+    def update(self, text: str, parse_mode: Optional[str] = None):
+        """Заменяет текст сообщения, не дожидаясь отправки."""
+        self._text = text
+        self._parse_mode = parse_mode
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def finish(self, text: str, parse_mode: Optional[str] = None):
+        """Показывает итог синхронизации и дожидается, пока он дойдёт до пользователя."""
+        self.update(text, parse_mode)
+        await self._flush_task
+
+    async def _flush(self):
+        while self._text != self._shown:
+            text, parse_mode = self._text, self._parse_mode
+            try:
+                if self._message is None:
+                    self._message = await self.outbox.send(
+                        chat_id=self.chat_id, text=text, parse_mode=parse_mode, interactive=True
+                    )
+                    if self._message is None:
+                        # Outbox уже записал причину в лог; редактировать нечего
+                        return
+                else:
+                    await self._message.edit_text(text, parse_mode=parse_mode)
+            except TelegramAPIError as e:
+                # Сообщение удалено пользователем, уже содержит этот текст или Telegram недоступен - синхронизацию это не прерывает
+                logger.warning(f"Не удалось обновить сообщение о синхронизации пользователя {self.chat_id}: {e}")
+            self._shown = text
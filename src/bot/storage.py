@@ -0,0 +1,100 @@
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from cryptography.fernet import InvalidToken
+from loguru import logger
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+import copy
+import json
+
+from src.config import FSM_CACHE_SIZE, FSM_CACHE_TTL, FSM_STATE_TTL_HOURS
+from src.database.queries import get_fsm_record, set_fsm_state, set_fsm_data, delete_fsm_record
+from src.utils.cache import TTLCache
+from src.utils.crypto import decrypt_data
+
+# Запись диалога в кэше: (состояние, данные, время последнего изменения; None - записи в БД нет)
+FsmRecord = Tuple[Optional[str], Dict[str, Any], Optional[datetime]]
+
+_EMPTY_RECORD: FsmRecord = (None, {}, None)
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Хранилище состояний диалогов (FSM) в БД бота вместо MemoryStorage: незавершённые регистрация,
+    добавление дедлайна и ввод интервала уведомлений переживают перезапуск бота.
+
+    Записи кэшируются в памяти (TTLCache), каждое изменение сразу пишется в БД (write-through), поэтому
+    повторные чтения в рамках диалога не обращаются к БД. Диалог, который не менялся дольше `state_ttl`,
+    считается брошенным: при чтении он сбрасывается, а записи удаляет cleanup_stale_fsm_states.
+    """
+
+    def __init__(
+        self,
+        key_builder: Optional[KeyBuilder] = None,
+        cache_size: int = FSM_CACHE_SIZE,
+        cache_ttl: float = FSM_CACHE_TTL,
+        state_ttl: timedelta = timedelta(hours=FSM_STATE_TTL_HOURS)
+    ):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = state_ttl
+        self._cache = TTLCache(cache_size, cache_ttl)
+
+    async def _load(self, key: str) -> FsmRecord:
+        """Возвращает запись диалога из кэша или БД, сбрасывая устаревшую."""
+        record = self._cache.get(key)
+        if record is None:
+            row = await get_fsm_record(key)
+            record = _EMPTY_RECORD if row is None else (row.state, _read_data(key, row.encrypted_data), row.updated_at)
+            self._cache.set(key, record)
+
+        updated_at = record[2]
+        if updated_at is not None and updated_at < datetime.now() - self.state_ttl:
+            logger.info(f"Диалог {key} не менялся дольше {self.state_ttl} и сброшен")
+            await delete_fsm_record(key)
+            self._cache.set(key, _EMPTY_RECORD)
+            return _EMPTY_RECORD
+        return record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        state_name = state.state if isinstance(state, State) else state
+        await set_fsm_state(storage_key, state_name)
+
+        # Данные из кэша остаются актуальными; без записи в кэше они будут прочитаны из БД при обращении
+        cached = self._cache.get(storage_key)
+        if cached is not None:
+            self._cache.set(storage_key, (state_name, cached[1], datetime.now()))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        await set_fsm_data(storage_key, data)
+
+        cached = self._cache.get(storage_key)
+        if cached is not None:
+            self._cache.set(storage_key, (cached[0], copy.deepcopy(data), datetime.now()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._load(self.key_builder.build(key))
+        return copy.deepcopy(data)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+def _read_data(key: str, encrypted_data: Optional[str]) -> Dict[str, Any]:
+    """Расшифровывает данные диалога; нерасшифровываемые (сменился ENCRYPTION_KEY) считаются пустыми."""
+    if not encrypted_data:
+        return {}
+    try:
+        return json.loads(decrypt_data(encrypted_data))
+    except (InvalidToken, ValueError):
+        logger.warning(f"Не удалось прочитать данные диалога {key}, они будут сброшены")
+        return {}
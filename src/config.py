@@ -1,4 +1,5 @@
 from environs import Env
+from environs import validate
 from os import getenv
 
 env = Env()
@@ -11,3 +12,94 @@ ADMIN_ID = env.int("ADMIN_ID")
 DB_PATH = getenv("DB_PATH", "database/database.db")
 
 ENCRYPTION_KEY = env.str("ENCRYPTION_KEY", default=None)
+
+# Синхронизация с ЛК: число параллельных воркеров и предельное время обработки одного пользователя (в секундах)
+SYNC_WORKERS = env.int("SYNC_WORKERS", default=5)
+SYNC_USER_TIMEOUT = env.int("SYNC_USER_TIMEOUT", default=120)
+# На сколько частей делится час фоновой синхронизации: каждая часть пользователей обрабатывается отдельным
+# запуском задачи (по умолчанию 60 - раз в минуту), чтобы нагрузка на ЛК, БД и Telegram шла ровно, а не пиком
+SYNC_SLICES = env.int("SYNC_SLICES", default=60, validate=validate.Range(min=1, max=3600))
+# Границы интервала фоновой синхронизации пользователя (в часах): часто меняющиеся списки, близкие дедлайны
+# и активные пользователи проверяются раз в SYNC_MIN_INTERVAL_HOURS, давно не менявшиеся - реже, до SYNC_MAX_INTERVAL_HOURS
+SYNC_MIN_INTERVAL_HOURS = env.int("SYNC_MIN_INTERVAL_HOURS", default=1, validate=validate.Range(min=1, max=24))
+SYNC_MAX_INTERVAL_HOURS = env.int(
+    "SYNC_MAX_INTERVAL_HOURS",
+    default=8,
+    validate=validate.Range(
+        min=SYNC_MIN_INTERVAL_HOURS, max=24,
+        error="Должно быть не меньше SYNC_MIN_INTERVAL_HOURS ({min}) и не больше {max}"
+    )
+)
+
+# Защита ЛК (pro.guap.ru): общий лимит запросов в секунду и размер допустимого всплеска
+LK_RATE_LIMIT = env.float("LK_RATE_LIMIT", default=2.0)
+LK_RATE_BURST = env.int("LK_RATE_BURST", default=5)
+
+# После скольких сбоев ЛК подряд (5xx, таймауты) запросы приостанавливаются и на сколько секунд
+LK_BREAKER_THRESHOLD = env.int("LK_BREAKER_THRESHOLD", default=5)
+LK_BREAKER_COOLDOWN = env.int("LK_BREAKER_COOLDOWN", default=300)
+
+# Таймауты запросов к ЛК (в секундах): общий на установку соединения и на чтение ответа по этапам.
+# Этапы задаются переменной вида LK_READ_TIMEOUTS=login=15,tasks=30 (неуказанные берутся по умолчанию)
+LK_CONNECT_TIMEOUT = env.float("LK_CONNECT_TIMEOUT", default=5.0)
+LK_READ_TIMEOUTS = {
+    "login": 15.0, "profile": 10.0, "groups": 15.0, "tasks": 20.0,
+    **env.dict("LK_READ_TIMEOUTS", subcast_values=float, default={})
+}
+
+# Повторы GET-запросов к ЛК при таймаутах, обрывах соединения и 5xx: число повторов и базовая пауза (в секундах)
+LK_GET_RETRIES = env.int("LK_GET_RETRIES", default=2)
+LK_RETRY_BACKOFF = env.float("LK_RETRY_BACKOFF", default=1.0)
+
+# Разбор HTML страниц ЛК вне event loop: "thread" - пул потоков, "process" - пул процессов (не конкурирует
+# с ботом за GIL, но требует отдельной памяти на каждый процесс), и число воркеров пула
+PARSE_EXECUTOR = env.str("PARSE_EXECUTOR", default="thread", validate=validate.OneOf(["thread", "process"]))
+PARSE_WORKERS = env.int("PARSE_WORKERS", default=2)
+
+# Сколько сеансов работы с ЛК (вход + загрузка страниц) может идти одновременно
+# и сколько из них зарезервировано под запросы пользователей (регистрация, /update), недоступных фоновой синхронизации
+LK_MAX_SESSIONS = env.int("LK_MAX_SESSIONS", default=8)
+LK_INTERACTIVE_RESERVED = env.int("LK_INTERACTIVE_RESERVED", default=2)
+
+# Исходящие сообщения бота (рассылки планировщика): общий лимит сообщений в секунду (лимит Telegram - около 30),
+# минимальный интервал между сообщениями в один чат (в секундах), число параллельных отправок
+# и сколько раз повторять отправку при сетевых ошибках и ошибках сервера Telegram
+OUTBOX_RATE = env.float("OUTBOX_RATE", default=25.0)
+OUTBOX_CHAT_INTERVAL = env.float("OUTBOX_CHAT_INTERVAL", default=1.0)
+OUTBOX_WORKERS = env.int("OUTBOX_WORKERS", default=10)
+OUTBOX_MAX_RETRIES = env.int("OUTBOX_MAX_RETRIES", default=3)
+
+# Ежедневные напоминания, пропущенные из-за простоя бота, досылаются, если опоздание не больше стольких дней
+REMINDER_CATCHUP_DAYS = env.int("REMINDER_CATCHUP_DAYS", default=1)
+
+# Час, в который рассылаются ежедневные напоминания о дедлайнах
+REMINDER_DAILY_HOUR = env.int("REMINDER_DAILY_HOUR", default=9)
+
+# Через сколько минут незавершённая рассылка напоминаний пользователю (бот упал, не дождавшись доставки)
+# считается прерванной, и пользователь снова выбирается для напоминания
+REMINDER_CLAIM_TIMEOUT_MINUTES = env.int(
+    "REMINDER_CLAIM_TIMEOUT_MINUTES", default=30, validate=validate.Range(min=1, max=24 * 60)
+)
+
+# Настройки SQLite, применяемые к каждому соединению (см. src/database/engine.py):
+# режим журнала (WAL - чтение не блокируется записью), синхронизация с диском, размер кэша страниц (КБ),
+# размер отображения файла БД в память (МБ), ожидание блокировки (мс), хранение временных таблиц
+DB_JOURNAL_MODE = env.str("DB_JOURNAL_MODE", default="WAL", validate=validate.OneOf(["WAL", "DELETE", "TRUNCATE"]))
+DB_SYNCHRONOUS = env.str("DB_SYNCHRONOUS", default="NORMAL", validate=validate.OneOf(["OFF", "NORMAL", "FULL"]))
+DB_CACHE_SIZE_KB = env.int("DB_CACHE_SIZE_KB", default=16384)
+DB_MMAP_SIZE_MB = env.int("DB_MMAP_SIZE_MB", default=128)
+DB_BUSY_TIMEOUT_MS = env.int("DB_BUSY_TIMEOUT_MS", default=5000)
+DB_TEMP_STORE = env.str("DB_TEMP_STORE", default="MEMORY", validate=validate.OneOf(["DEFAULT", "FILE", "MEMORY"]))
+# Сколько соединений с БД держит пул движка
+DB_POOL_SIZE = env.int("DB_POOL_SIZE", default=5)
+
+# Кэш пользователей для хэндлеров бота: сколько записей хранить и сколько секунд запись считается свежей
+USER_CACHE_SIZE = env.int("USER_CACHE_SIZE", default=1024)
+USER_CACHE_TTL = env.float("USER_CACHE_TTL", default=300.0)
+
+# Состояния диалогов (FSM) хранятся в БД и переживают перезапуск бота. Кэш состояний в памяти:
+# сколько записей хранить и сколько секунд запись считается свежей (при нескольких процессах бота - уменьшить);
+# через сколько часов без изменений незавершённый диалог (регистрация, добавление дедлайна) сбрасывается
+FSM_CACHE_SIZE = env.int("FSM_CACHE_SIZE", default=1024)
+FSM_CACHE_TTL = env.float("FSM_CACHE_TTL", default=300.0)
+FSM_STATE_TTL_HOURS = env.int("FSM_STATE_TTL_HOURS", default=24, validate=validate.Range(min=1))
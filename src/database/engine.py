@@ -1,9 +1,43 @@
+from typing import Dict
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
-from src.config import DB_PATH
+from src.config import (
+    DB_PATH, DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE_MB,
+    DB_BUSY_TIMEOUT_MS, DB_TEMP_STORE, DB_POOL_SIZE
+)
+
+# Профиль SQLite для бота: WAL позволяет хэндлерам читать, пока планировщик пишет,
+# а synchronous=NORMAL в режиме WAL не теряет целостность при сбое (может потеряться лишь последняя транзакция)
+SQLITE_PRAGMAS: Dict[str, object] = {
+    "journal_mode": DB_JOURNAL_MODE,
+    "synchronous": DB_SYNCHRONOUS,
+    "cache_size": -DB_CACHE_SIZE_KB,  # Отрицательное значение - размер в КБ, а не в страницах
+    "mmap_size": DB_MMAP_SIZE_MB * 1024 * 1024,
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,
+    "temp_store": DB_TEMP_STORE,
+    # SQLite проверяет внешние ключи (и ON DELETE CASCADE) только по запросу
+    "foreign_keys": "ON",
+}
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas: Dict[str, object]):
+    """Применяет PRAGMA к новому соединению с SQLite."""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 
 # Асинхронный "движок" для подключения к SQLite-БД
-engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}")
+engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", pool_size=DB_POOL_SIZE)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    set_sqlite_pragmas(dbapi_connection, SQLITE_PRAGMAS)
+
 
 # Фабрика сессий, через которую происходит взаимодействие с БД
 async_session_factory = async_sessionmaker(engine)
@@ -1,9 +1,25 @@
 from datetime import datetime
+import zlib
 
-from sqlalchemy import Integer, BigInteger, String, Boolean, func
+from sqlalchemy import Integer, BigInteger, String, Text, Boolean, ForeignKey, Index, UniqueConstraint, func, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.ext.asyncio import AsyncAttrs
 
+# За сколько дней до дедлайна можно включить ежедневные напоминания (кнопки в настройках уведомлений)
+REMINDER_DAY_OPTIONS = (1, 3, 7)
+
+# Период фоновой синхронизации с ЛК (в секундах): каждый пользователь синхронизируется раз в период
+SYNC_PERIOD_SECONDS = 3600
+
+
+def sync_offset_for(telegram_id: int) -> int:
+    """Постоянное смещение синхронизации пользователя внутри периода (в секундах) - хэш его telegram_id."""
+    return zlib.crc32(str(telegram_id).encode()) % SYNC_PERIOD_SECONDS
+
+
+def _default_sync_offset(context) -> int:
+    return sync_offset_for(context.get_current_parameters()['telegram_id'])
+
 # Базовый класс для моделей, который добавляет асинхронные возможности
 class Base(AsyncAttrs, DeclarativeBase):
     pass
@@ -20,22 +36,83 @@ class User(Base):
 
     encrypted_login_lk: Mapped[str] = mapped_column(String(255), nullable=True)
     encrypted_password_lk: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Зашифрованные cookies сессии ЛК (JSON), чтобы не проходить вход через Keycloak при каждой синхронизации
+    encrypted_lk_cookies: Mapped[str] = mapped_column(Text, nullable=True)
+
+    # Отпечаток списка дедлайнов из ЛК на момент последней синхронизации и время последней проверки
+    deadlines_fingerprint: Mapped[str] = mapped_column(String(64), nullable=True)
+    last_checked_at: Mapped[datetime] = mapped_column(nullable=True)
+    # Причина последней неудачной синхронизации ('timeout', 'refused', 'server_error', ...), NULL - синхронизация удалась
+    last_sync_error: Mapped[str] = mapped_column(String(32), nullable=True)
+    # Когда список дедлайнов в ЛК последний раз менялся, когда пользователь последний раз пользовался ботом
+    # и не раньше какого времени его снова синхронизировать (NULL - при ближайшем его отрезке часа)
+    deadlines_changed_at: Mapped[datetime] = mapped_column(nullable=True)
+    last_seen_at: Mapped[datetime] = mapped_column(nullable=True)
+    next_sync_at: Mapped[datetime] = mapped_column(nullable=True)
 
     notifications_enabled: Mapped[bool] = mapped_column(Boolean, default=True, server_default='true')
     notification_days: Mapped[str] = mapped_column(String, default="1,3,7", server_default='1,3,7')
     notification_interval_hours: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    # Секунда внутри часа, на которую приходится фоновая синхронизация пользователя (см. sync_offset_for)
+    sync_offset: Mapped[int] = mapped_column(
+        Integer, default=_default_sync_offset, server_default='0', nullable=False, index=True
+    )
+    # Ближайшее время, когда пользователю может быть положено напоминание (NULL - ещё не рассчитано или выключены)
+    # и когда задача напоминаний взяла его в работу (NULL - не взято или рассылка завершена)
+    next_reminder_at: Mapped[datetime] = mapped_column(nullable=True, index=True)
+    reminder_claimed_at: Mapped[datetime] = mapped_column(nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
 
 # Модель Дедлайна
 class Deadline(Base):
     __tablename__ = 'deadlines'
+    __table_args__ = (
+        # Списки активных дедлайнов и корзины пользователя, статистика (фильтр по user_id, is_trashed, сортировка по дате)
+        Index('ix_deadlines_user_trashed_due', 'user_id', 'is_trashed', 'due_date'),
+        # Синхронизация с ЛК и удаление личных дедлайнов (фильтр по user_id, is_custom)
+        Index('ix_deadlines_user_custom', 'user_id', 'is_custom'),
+        # Напоминания и очистка журнала: активные дедлайны ближайших дней всех пользователей
+        Index('ix_deadlines_active_due', 'due_date', sqlite_where=text('is_trashed = 0')),
+        # Очистка просроченных дедлайнов из корзин
+        Index('ix_deadlines_trashed_due', 'due_date', sqlite_where=text('is_trashed = 1')),
+        # Естественный ключ дедлайна из ЛК: синхронизация вставляет и обновляет дедлайны через ON CONFLICT.
+        # Личные дедлайны не ограничены - пользователь может завести несколько одинаковых
+        Index(
+            'uq_deadlines_user_course_task', 'user_id', 'course_name', 'task_name',
+            unique=True, sqlite_where=text('is_custom = 0')
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE', name='fk_deadlines_user_id_users'), nullable=False)
     course_name: Mapped[str] = mapped_column(String(100), nullable=False)
     task_name: Mapped[str] = mapped_column(String(255), nullable=False)
     due_date: Mapped[datetime] = mapped_column(nullable=False)
 
     is_custom: Mapped[bool] = mapped_column(Boolean, default=False, server_default='false')
     is_trashed: Mapped[bool] = mapped_column(Boolean, default=False, server_default='false')
+
+# Модель отправленного напоминания (журнал, чтобы не дублировать и не пропускать напоминания)
+class SentReminder(Base):
+    __tablename__ = 'sent_reminders'
+    __table_args__ = (UniqueConstraint('deadline_id', 'kind', 'day_offset'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    deadline_id: Mapped[int] = mapped_column(ForeignKey('deadlines.id', ondelete='CASCADE'), nullable=False)
+    # Вид напоминания ('daily' - ежедневное) и за сколько дней до дедлайна оно положено по настройкам
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    day_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    sent_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+# Модель состояния диалога (FSM aiogram) пользователя в чате, см. src/bot/storage.py
+class FsmState(Base):
+    __tablename__ = 'fsm_states'
+
+    # Ключ записи FSM (бот, чат, пользователь, ...), см. DefaultKeyBuilder aiogram
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Данные диалога (JSON) зашифрованы: при регистрации в них хранится логин от ЛК
+    encrypted_data: Mapped[str] = mapped_column(Text, nullable=True)
+    # Время последнего изменения: по нему сбрасываются давно брошенные диалоги
+    updated_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
@@ -1,12 +1,40 @@
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Dict, Tuple
+import json
 
 from loguru import logger
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, insert, update, delete, func, or_, cast, literal, tuple_, Integer, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from src.database.engine import async_session_factory
-from src.database.models import User, Deadline
+from src.database.models import User, Deadline, SentReminder, FsmState, REMINDER_DAY_OPTIONS, SYNC_PERIOD_SECONDS
+from src.utils.cache import TTLCache
 from src.utils.crypto import encrypt_data
+from src.config import (
+    REMINDER_DAILY_HOUR, REMINDER_CLAIM_TIMEOUT_MINUTES, USER_CACHE_SIZE, USER_CACHE_TTL, SYNC_MIN_INTERVAL_HOURS, SYNC_MAX_INTERVAL_HOURS
+)
+
+# Кэш строк users по telegram_id для хэндлеров бота (см. get_cached_user).
+# Каждая функция, изменяющая пользователя, сбрасывает или обновляет его запись
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+# Отметка об использовании бота пишется в БД не чаще раза в столько секунд на пользователя
+ACTIVITY_RESOLUTION_SECONDS = 3600
+# Пользователи, чья активность уже записана в БД в пределах ACTIVITY_RESOLUTION_SECONDS
+_recent_activity = TTLCache(USER_CACHE_SIZE, ACTIVITY_RESOLUTION_SECONDS)
+
+# Адаптивный интервал синхронизации (см. _sync_interval_hours): дедлайн ближе SYNC_NEAR_DEADLINE - интервал
+# минимальный; за каждый порог SYNC_BACKOFF_STEPS без изменений в ЛК интервал удваивается; пользователям,
+# заходившим в бота за SYNC_ACTIVE_PERIOD, - не больше двух минимальных
+SYNC_NEAR_DEADLINE = timedelta(days=3)
+SYNC_BACKOFF_STEPS = (timedelta(days=1), timedelta(days=3), timedelta(days=7))
+SYNC_ACTIVE_PERIOD = timedelta(days=1)
+# Запас при планировании: пользователь обрабатывается в своём отрезке часа, а синхронизация завершается
+# позже его начала - без запаса следующий запуск пропускал бы лишний час
+SYNC_SCHEDULE_MARGIN = timedelta(seconds=SYNC_PERIOD_SECONDS / 2)
+
+# Курсор страницы списка дедлайнов: (срок сдачи, id) крайнего дедлайна страницы
+DeadlineCursor = Tuple[datetime, int]
 
 
 async def add_user(telegram_id: int, username: str | None = None):
@@ -32,12 +60,15 @@ async def set_user_credentials(
     login: str,
     password: str,
     profile_id: Optional[str] = None,
-    full_name: Optional[str] = None
+    full_name: Optional[str] = None,
+    lk_cookies: Optional[List[Dict[str, str]]] = None
 ):
-    """Шифрует и сохраняет учётные данные, ID профиля и ФИО пользователя в БД."""
+    """Шифрует и сохраняет учётные данные, cookies сессии ЛК, ID профиля и ФИО пользователя в БД."""
     async with async_session_factory() as session:
         encrypted_login = encrypt_data(login)
         encrypted_password = encrypt_data(password)
+        # Сессия от прежних учётных данных не должна переживать повторную регистрацию
+        encrypted_cookies = encrypt_data(json.dumps(lk_cookies)) if lk_cookies else None
 
         query = (
             update(User)
@@ -45,15 +76,77 @@ async def set_user_credentials(
             .values(
                 encrypted_login_lk=encrypted_login,
                 encrypted_password_lk=encrypted_password,
+                encrypted_lk_cookies=encrypted_cookies,
+                deadlines_fingerprint=None,
                 profile_id=int(profile_id) if profile_id else None,
                 full_name=full_name
             )
         )
         await session.execute(query)
         await session.commit()
+        user_cache.invalidate(telegram_id)
         logger.success(f"Пользователь с telegram_id={telegram_id} обновлен")
 
 
+async def set_user_profile(telegram_id: int, profile_id: Optional[str], full_name: Optional[str]):
+    """Обновляет ID профиля ГУАП и ФИО пользователя (пустые значения из ЛК не затирают сохранённые)."""
+    values = {}
+    if profile_id:
+        values['profile_id'] = int(profile_id)
+    if full_name:
+        values['full_name'] = full_name
+    if not values:
+        return
+
+    async with async_session_factory() as session:
+        await session.execute(update(User).where(User.telegram_id == telegram_id).values(**values))
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+        logger.success(f"Профиль пользователя с telegram_id={telegram_id} обновлён")
+
+
+async def set_lk_cookies(telegram_id: int, lk_cookies: Optional[List[Dict[str, str]]]):
+    """Шифрует и сохраняет cookies сессии ЛК пользователя (None - сбрасывает сохранённую сессию)."""
+    async with async_session_factory() as session:
+        encrypted_cookies = encrypt_data(json.dumps(lk_cookies)) if lk_cookies else None
+        query = (
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(encrypted_lk_cookies=encrypted_cookies)
+        )
+        await session.execute(query)
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+        logger.success(f"Сессия ЛК пользователя с telegram_id={telegram_id} сохранена")
+
+
+async def replace_lk_cookies(
+    telegram_id: int,
+    previous_encrypted_cookies: Optional[str],
+    lk_cookies: Optional[List[Dict[str, str]]]
+) -> bool:
+    """
+    Сохраняет cookies сессии ЛК, только если сохранённые с тех пор не изменились (`previous_encrypted_cookies` -
+    значение encrypted_lk_cookies, прочитанное до обращения к ЛК). Так более новая сессия, записанная
+    параллельной синхронизацией, не затирается. Возвращает True, если cookies сохранены.
+    """
+    async with async_session_factory() as session:
+        encrypted_cookies = encrypt_data(json.dumps(lk_cookies)) if lk_cookies else None
+        if previous_encrypted_cookies is None:
+            unchanged = User.encrypted_lk_cookies.is_(None)
+        else:
+            unchanged = User.encrypted_lk_cookies == previous_encrypted_cookies
+        query = (
+            update(User)
+            .where(User.telegram_id == telegram_id, unchanged)
+            .values(encrypted_lk_cookies=encrypted_cookies)
+        )
+        result = await session.execute(query)
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+        return result.rowcount > 0
+
+
 async def get_all_users(only_with_notifications: bool = False):
     """
     Возвращает список всех зарегистрированных пользователей.
@@ -68,6 +161,23 @@ async def get_all_users(only_with_notifications: bool = False):
         return result.scalars().all()
 
 
+async def get_users_in_sync_window(start: int, end: int, now: datetime):
+    """
+    Возвращает пользователей, чьё смещение синхронизации (sync_offset) попадает в окно (start, end] секунд часа
+    и чья очередная синхронизация уже наступила (next_sync_at). Окно может переходить через начало часа (start > end).
+    Выборка идёт по индексу sync_offset.
+    """
+    if start < end:
+        window = (User.sync_offset > start) & (User.sync_offset <= end)
+    else:
+        window = (User.sync_offset > start) | (User.sync_offset <= end)
+    due = or_(User.next_sync_at.is_(None), User.next_sync_at <= now)
+
+    async with async_session_factory() as session:
+        result = await session.execute(select(User).where(window, due))
+        return result.scalars().all()
+
+
 async def get_user_by_telegram_id(telegram_id: int):
     """Возвращает пользователя по его telegram_id."""
     async with async_session_factory() as session:
@@ -76,89 +186,182 @@ async def get_user_by_telegram_id(telegram_id: int):
         return result.scalars().first()
 
 
-async def update_user_deadlines(telegram_id: int, new_parsed_deadlines: list[dict]) -> List[Dict]:
+async def touch_user_activity(telegram_id: int):
+    """
+    Отмечает, что пользователь пользуется ботом, и ставит его синхронизацию на ближайший отрезок часа:
+    вернувшийся после перерыва пользователь не ждёт долгий интервал, набранный за время простоя.
+    В БД пишется не чаще раза в ACTIVITY_RESOLUTION_SECONDS на пользователя.
+    """
+    if _recent_activity.get(telegram_id):
+        return
+    _recent_activity.set(telegram_id, True)
+
+    async with async_session_factory() as session:
+        await session.execute(
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(last_seen_at=datetime.now(), next_sync_at=None)
+        )
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+
+
+async def get_cached_user(telegram_id: int) -> Optional[User]:
+    """
+    Возвращает пользователя по telegram_id из кэша, а при промахе - из БД (с сохранением в кэш).
+    Для хэндлеров бота; планировщик читает пользователей из БД напрямую.
+    Возвращённый объект отсоединён от сессии и общий для всех обращений - изменять его нельзя.
+    """
+    user = user_cache.get(telegram_id)
+    if user is None:
+        user = await get_user_by_telegram_id(telegram_id)
+        if user:
+            user_cache.set(telegram_id, user)
+    return user
+
+
+def _user_id_subquery(telegram_id: int):
+    """Подзапрос id пользователя по telegram_id - встраивается в основной запрос вместо отдельного поиска пользователя."""
+    return select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
+
+
+async def update_user_deadlines(
+    telegram_id: int,
+    new_parsed_deadlines: list[dict],
+    fingerprint: Optional[str] = None
+) -> List[Dict]:
     """
     "Умно" синхронизирует дедлайны из парсера с базой данных:
     1) Не трогает личные дедлайны (добавленные вручную)
     2) Не добавляет дедлайны, которые занесены в корзину
     3) Обновляет дату, если срок сдачи дедлайна изменился
 
+    Сверка идёт на стороне БД по естественному ключу (пользователь, предмет, задание): удаление исчезнувших
+    из ЛК дедлайнов, вставка новых и обновление изменившихся дат - по одному запросу, поэтому запись
+    в БД растёт с числом изменений, а не с числом дедлайнов.
+
+    Вместе с изменениями сохраняет отпечаток списка `fingerprint`, чтобы следующая синхронизация
+    с тем же списком могла пропустить сверку (см. mark_deadlines_checked). Время изменения списка
+    (deadlines_changed_at) обновляется, только если сверка что-то изменила или отпечаток отличается от прошлого.
+
     Возвращает список словарей с данными о вновь добавленных дедлайнах.
     """
+    # Ключи всех дедлайнов из ЛК (в том числе с нераспознанной датой - такие не удаляются, но и не добавляются)
+    parsed_keys = {(d['subject'], d['task']): d for d in new_parsed_deadlines}
+    rows = []
+    for (course_name, task_name), data in parsed_keys.items():
+        try:
+            due_date = datetime.strptime(data['due_date'], "%d.%m.%Y")
+        except ValueError:
+            continue
+        rows.append({'course_name': course_name, 'task_name': task_name, 'due_date': due_date})
+
+    natural_key = [Deadline.user_id, Deadline.course_name, Deadline.task_name]
+    lk_deadlines_only = Deadline.is_custom == False
+
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
+        user_row = (await session.execute(
+            select(
+                User.id, User.deadlines_fingerprint, User.deadlines_changed_at, User.last_seen_at
+            ).where(User.telegram_id == telegram_id)
+        )).first()
+        if not user_row:
             return []
+        user_id = user_row.id
 
-        # Получение ВСЕХ парсерных дедлайнов (и активных, и из корзины)
-        existing_deadlines_query = await session.execute(
-            select(Deadline).where(Deadline.user_id == user.id, Deadline.is_custom == False)
-        )
-        existing_deadlines_list = existing_deadlines_query.scalars().all()
-
-        # Создание множества для быстрой проверки (ключ: предмет + задание)
-        existing_deadlines_set = {
-            (d.course_name, d.task_name): d for d in existing_deadlines_list
-        }
-        parsed_deadlines_set = {
-            (d['subject'], d['task']): d for d in new_parsed_deadlines
-        }
+        # Удаление дедлайнов, которых больше нет в ЛК (и активных, и из корзины)
+        delete_query = delete(Deadline).where(Deadline.user_id == user_id, lk_deadlines_only)
+        if parsed_keys:
+            delete_query = delete_query.where(tuple_(Deadline.course_name, Deadline.task_name).not_in(list(parsed_keys)))
+        changed_rows = (await session.execute(delete_query)).rowcount
 
-        # Поиск дедлайнов, которые нужно удалить (ЕСТЬ в БД, но НЕТ в парсере)
-        to_delete_ids = [
-            existing_deadlines_set[key].id
-            for key in existing_deadlines_set
-            if key not in parsed_deadlines_set
-        ]
-        if to_delete_ids:
-            await session.execute(delete(Deadline).where(Deadline.id.in_(to_delete_ids)))
-
-        # Поиск и создание дедлайнов, которые нужно добавить
         newly_added_deadlines_data = []
-        objects_to_add_in_db = []
-
-        for key, data in parsed_deadlines_set.items():
-            try:
-                due_date_obj = datetime.strptime(data['due_date'], "%d.%m.%Y")
-            except ValueError:
-                continue
-
-            # Новый дедлайн, которого нет в БД
-            if key not in existing_deadlines_set:
-                newly_added_deadlines_data.append({
-                    'course_name': data['subject'],
-                    'task_name': data['task'],
-                    'due_date': due_date_obj
-                })
-
-                objects_to_add_in_db.append(
-                    Deadline(
-                        user_id=user.id,
-                        course_name=data['subject'],
-                        task_name=data['task'],
-                        due_date=due_date_obj,
-                        is_custom=False
-                    )
-                )
+        if rows:
+            values = [{'user_id': user_id, 'is_custom': False, **row} for row in rows]
+
+            # Вставка новых дедлайнов: уже известные (в том числе из корзины) пропускаются по конфликту ключа
+            insert_query = (
+                sqlite_insert(Deadline)
+                .values(values)
+                .on_conflict_do_nothing(index_elements=natural_key, index_where=lk_deadlines_only)
+                .returning(Deadline.course_name, Deadline.task_name, Deadline.due_date)
+            )
+            inserted = {(row.course_name, row.task_name) for row in await session.execute(insert_query)}
+            # В порядке списка из ЛК
+            newly_added_deadlines_data = [
+                {'course_name': row['course_name'], 'task_name': row['task_name'], 'due_date': row['due_date']}
+                for row in rows if (row['course_name'], row['task_name']) in inserted
+            ]
+
+            # Обновление дат, изменившихся на сайте (строки с той же датой не перезаписываются)
+            upsert_query = sqlite_insert(Deadline).values(values)
+            upsert_query = upsert_query.on_conflict_do_update(
+                index_elements=natural_key,
+                index_where=lk_deadlines_only,
+                set_={'due_date': upsert_query.excluded.due_date},
+                where=Deadline.due_date != upsert_query.excluded.due_date
+            )
+            changed_rows += len(inserted) + (await session.execute(upsert_query)).rowcount
+
+        # Отпечатка нет (первая синхронизация или после сброса) - об изменении в ЛК говорят только изменённые строки
+        now = datetime.now()
+        fingerprint_changed = user_row.deadlines_fingerprint is not None and user_row.deadlines_fingerprint != fingerprint
+        changed_at = now if changed_rows or fingerprint_changed else user_row.deadlines_changed_at
+        next_sync_at = await _plan_next_sync(session, user_id, now, changed_at, user_row.last_seen_at)
+        await session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                deadlines_fingerprint=fingerprint, last_checked_at=now, last_sync_error=None,
+                deadlines_changed_at=changed_at, next_sync_at=next_sync_at
+            )
+        )
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+        if newly_added_deadlines_data:
+            logger.success(f'Добавлено {len(newly_added_deadlines_data)} дедлайнов')
 
-            # Дедлайн уже есть в БД
-            else:
-                # Проверка, изменилась ли дата сдачи на сайте
-                existing_dl = existing_deadlines_set[key]
+        return newly_added_deadlines_data
 
-                # Сравнивание дат
-                if existing_dl.due_date.date() != due_date_obj.date():
-                    existing_dl.due_date = due_date_obj
 
+async def mark_deadlines_checked(telegram_id: int):
+    """
+    Отмечает время проверки ЛК без сверки дедлайнов (список в ЛК не изменился с прошлой синхронизации)
+    и планирует следующую синхронизацию.
+    """
+    async with async_session_factory() as session:
+        user_row = (await session.execute(
+            select(User.id, User.deadlines_changed_at, User.last_seen_at).where(User.telegram_id == telegram_id)
+        )).first()
+        if not user_row:
+            return
+
+        now = datetime.now()
+        next_sync_at = await _plan_next_sync(
+            session, user_row.id, now, user_row.deadlines_changed_at, user_row.last_seen_at
+        )
+        query = (
+            update(User)
+            .where(User.id == user_row.id)
+            .values(last_checked_at=now, last_sync_error=None, next_sync_at=next_sync_at)
+        )
+        await session.execute(query)
+        await session.commit()
+        user_cache.invalidate(telegram_id)
+        logger.info(f"Дедлайны пользователя с telegram_id={telegram_id} не изменились, сверка пропущена")
 
-        if objects_to_add_in_db:
-            session.add_all(objects_to_add_in_db)
 
+async def set_last_sync_error(telegram_id: int, reason: str):
+    """Сохраняет причину неудачной синхронизации с ЛК ('timeout', 'refused', 'server_error', ...)."""
+    async with async_session_factory() as session:
+        query = (
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(last_sync_error=reason)
+        )
+        await session.execute(query)
         await session.commit()
-        if objects_to_add_in_db:
-            logger.success(f'Добавлено {len(objects_to_add_in_db)} дедлайнов')
-
-        return newly_added_deadlines_data
+        user_cache.invalidate(telegram_id)
 
 
 async def get_users_with_upcoming_deadlines(days: int):
@@ -183,38 +386,30 @@ async def get_users_with_upcoming_deadlines(days: int):
 async def get_user_stats(telegram_id: int) -> dict:
     """Возвращает статистику пользователя по telegram_id"""
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            logger.error(f'Не удалось получить статистику пользователя с telegram_id={telegram_id}, пользователя не существует')
-            return {}
+        active = (Deadline.due_date >= datetime.now().date()) & (Deadline.is_trashed == False)
 
-        # Подсчёт всех активных дедлайнов
-        all_active_query = select(func.count(Deadline.id)).where(
-            Deadline.user_id == user.id,
-            Deadline.due_date >= datetime.now().date(),
-            Deadline.is_trashed == False
-        )
-        all_active_count = await session.execute(all_active_query)
-
-        # Подсчёт личных дедлайнов
-        custom_active_query = select(func.count(Deadline.id)).where(
-            Deadline.user_id == user.id,
-            Deadline.due_date >= datetime.now().date(),
-            Deadline.is_custom == True,
-            Deadline.is_trashed == False
-        )
-        custom_active_count = await session.execute(custom_active_query)
-
-        # Подсчёт дедлайнов в корзине
-        trashed_query = select(func.count(Deadline.id)).where(
-            Deadline.user_id == user.id,
-            Deadline.is_trashed == True
+        # Все счётчики считаются за один проход по дедлайнам пользователя (условная агрегация).
+        # LEFT JOIN оставляет строку и пользователю без дедлайнов, отсутствие строки - пользователя нет
+        query = (
+            select(
+                # Все активные дедлайны
+                func.count(Deadline.id).filter(active),
+                # Личные дедлайны
+                func.count(Deadline.id).filter(active, Deadline.is_custom == True),
+                # Дедлайны в корзине
+                func.count(Deadline.id).filter(Deadline.is_trashed == True),
+            )
+            .select_from(User)
+            .outerjoin(Deadline, Deadline.user_id == User.id)
+            .where(User.telegram_id == telegram_id)
+            .group_by(User.id)
         )
-        trashed_active_count = await session.execute(trashed_query)
+        row = (await session.execute(query)).first()
+        if not row:
+            logger.error(f'Не удалось получить статистику пользователя с telegram_id={telegram_id}, пользователя не существует')
+            return {}
 
-        active_count = all_active_count.scalar_one_or_none() or 0
-        custom_count = custom_active_count.scalar_one_or_none() or 0
-        trashed_count = trashed_active_count.scalar_one_or_none() or 0
+        active_count, custom_count, trashed_count = row
 
         logger.success(f'Статистика пользователя {telegram_id}: {active_count} активных дедлайнов, {custom_count} личных, {trashed_count} в корзине')
 
@@ -228,62 +423,350 @@ async def get_user_stats(telegram_id: int) -> dict:
 async def delete_user_data(telegram_id: int) -> bool:
     """Полностью удаляет пользователя и все его данные из БД."""
     async with async_session_factory() as session:
-        user_query = select(User).where(User.telegram_id == telegram_id)
-        user_result = await session.execute(user_query)
-        user = user_result.scalars().first()
-
-        if user:
-            # Удаление связанных дедлайнов
-            await session.execute(delete(Deadline).where(Deadline.user_id == user.id))
-            # Удаление пользователя
-            await session.execute(delete(User).where(User.telegram_id == telegram_id))
+        # Дедлайны и журнал напоминаний удаляются каскадно по внешним ключам
+        result = await session.execute(delete(User).where(User.telegram_id == telegram_id))
+        if result.rowcount:
             await session.commit()
+            user_cache.invalidate(telegram_id)
             logger.success(f'Пользователь с telegram_id={telegram_id} удалён')
             return True
     logger.error(f'Не удалось удалить пользователя с telegram_id={telegram_id}')
     return False
 
 
-async def get_user_deadlines_from_db(telegram_id: int) -> list[Deadline]:
-    """Получает все актуальные дедлайны пользователя из БД."""
+async def get_deadlines_page(
+    telegram_id: int,
+    trashed: bool = False,
+    page_size: int = 5,
+    after: Optional[DeadlineCursor] = None,
+    before: Optional[DeadlineCursor] = None
+) -> Tuple[List[Deadline], int]:
+    """
+    Возвращает одну страницу дедлайнов пользователя и общее число дедлайнов в списке.
+    trashed=False - актуальные дедлайны по возрастанию срока, trashed=True - корзина по убыванию срока.
+
+    Страницы листаются по ключу (due_date, id), а не по смещению: `after` - курсор последнего дедлайна
+    текущей страницы (следующая страница), `before` - первого (предыдущая). Без курсоров - первая страница.
+    Запрос читает по индексу только дедлайны нужной страницы, сколько бы их ни было у пользователя.
+    """
+    conditions = [Deadline.user_id == _user_id_subquery(telegram_id), Deadline.is_trashed == trashed]
+    if not trashed:
+        # Только дедлайны, которые ещё не прошли
+        conditions.append(Deadline.due_date >= datetime.now().date())
+
+    key = tuple_(Deadline.due_date, Deadline.id)
+    # Корзина идёт в обратном порядке, поэтому "вперёд" для неё - к меньшим ключам
+    ascending = not trashed
+    page_conditions = list(conditions)
+    if after is not None:
+        page_conditions.append(key > tuple_(*after) if ascending else key < tuple_(*after))
+    elif before is not None:
+        page_conditions.append(key < tuple_(*before) if ascending else key > tuple_(*before))
+        # Предыдущая страница выбирается в обратном порядке и затем разворачивается
+        ascending = not ascending
+
+    order = (Deadline.due_date.asc(), Deadline.id.asc()) if ascending else (Deadline.due_date.desc(), Deadline.id.desc())
+    query = select(Deadline).where(*page_conditions).order_by(*order).limit(page_size)
+
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            logger.error(f'Не удалось получить дедлайны пользователя с telegram_id={telegram_id}, пользователя не существует')
+        deadlines = list((await session.execute(query)).scalars().all())
+        total = await session.scalar(select(func.count(Deadline.id)).where(*conditions))
+
+    if before is not None:
+        deadlines.reverse()
+    logger.success(
+        f'Пользователь с telegram_id={telegram_id} получил {len(deadlines)} из {total} дедлайнов'
+        f'{" корзины" if trashed else ""}'
+    )
+    return deadlines, total
+
+
+def _sync_interval_hours(
+    now: datetime,
+    deadlines_changed_at: Optional[datetime],
+    nearest_due_date: Optional[datetime],
+    last_seen_at: Optional[datetime]
+) -> int:
+    """
+    Возвращает интервал фоновой синхронизации пользователя в часах (от SYNC_MIN_INTERVAL_HOURS до SYNC_MAX_INTERVAL_HOURS):
+    минимальный, если ближайший дедлайн из ЛК наступит в пределах SYNC_NEAR_DEADLINE; иначе удвоенный за каждый
+    порог SYNC_BACKOFF_STEPS, который список в ЛК не менялся, но для активных пользователей - не больше двух минимальных.
+    """
+    if nearest_due_date is not None and nearest_due_date - now <= SYNC_NEAR_DEADLINE:
+        return SYNC_MIN_INTERVAL_HOURS
+
+    unchanged_for = now - deadlines_changed_at if deadlines_changed_at else SYNC_BACKOFF_STEPS[-1]
+    interval = SYNC_MIN_INTERVAL_HOURS * 2 ** sum(unchanged_for >= step for step in SYNC_BACKOFF_STEPS)
+    if last_seen_at is not None and now - last_seen_at <= SYNC_ACTIVE_PERIOD:
+        interval = min(interval, 2 * SYNC_MIN_INTERVAL_HOURS)
+    return min(interval, SYNC_MAX_INTERVAL_HOURS)
+
+
+async def _plan_next_sync(
+    session,
+    user_id: int,
+    now: datetime,
+    deadlines_changed_at: Optional[datetime],
+    last_seen_at: Optional[datetime]
+) -> datetime:
+    """Возвращает время, не раньше которого пользователя снова синхронизировать (см. _sync_interval_hours)."""
+    nearest_due_date = await session.scalar(
+        select(func.min(Deadline.due_date)).where(
+            Deadline.user_id == user_id,
+            Deadline.is_trashed == False,
+            Deadline.is_custom == False,
+            Deadline.due_date >= now.date()
+        )
+    )
+    interval = _sync_interval_hours(now, deadlines_changed_at, nearest_due_date, last_seen_at)
+    return now + timedelta(hours=interval) - SYNC_SCHEDULE_MARGIN
+
+
+def _next_reminder_at(
+    notifications_enabled: bool,
+    notification_days: Optional[str],
+    notification_interval_hours: int,
+    after: datetime
+) -> Optional[datetime]:
+    """
+    Возвращает ближайшее после `after` время, когда пользователю может быть положено напоминание:
+    ежедневные - в REMINDER_DAILY_HOUR:00, частые - в начале каждого часа, кратного интервалу.
+    None - напоминания выключены или не выбраны ни дни, ни интервал.
+    """
+    if not notifications_enabled:
+        return None
+
+    slots = []
+    if notification_days:
+        daily_slot = after.replace(hour=REMINDER_DAILY_HOUR, minute=0, second=0, microsecond=0)
+        if daily_slot <= after:
+            daily_slot += timedelta(days=1)
+        slots.append(daily_slot)
+    if notification_interval_hours > 0:
+        interval_slot = after.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        while interval_slot.hour % notification_interval_hours:
+            interval_slot += timedelta(hours=1)
+        slots.append(interval_slot)
+    return min(slots, default=None)
+
+
+def _reschedule_reminders(user: User, after: Optional[datetime] = None):
+    """Пересчитывает время ближайшего напоминания пользователя после изменения его настроек."""
+    user.next_reminder_at = _next_reminder_at(
+        user.notifications_enabled, user.notification_days, user.notification_interval_hours,
+        after or datetime.now()
+    )
+
+
+async def claim_due_reminders(now: datetime) -> List[Dict]:
+    """
+    Находит пользователей, чьё время напоминания (next_reminder_at) наступило, и берёт их в работу
+    (reminder_claimed_at = `now`): повторный вызов этих пользователей не вернёт, пока рассылка не завершена
+    (complete_reminder_claims) или не прошло REMINDER_CLAIM_TIMEOUT_MINUTES. Если бот упал, не дождавшись доставки,
+    время напоминания не потеряно - пользователь будет выбран снова.
+    Возвращает [{id, telegram_id, notification_days, notification_interval_hours, slot}], где `slot` -
+    наступившее время напоминания (None - время ещё не было рассчитано, напоминать пока нечего).
+
+    Выборка идёт по индексу next_reminder_at, поэтому стоимость зависит от числа пользователей,
+    которым пора напомнить, а не от общего числа пользователей. Пользователи без выбранных дней и интервала
+    не выбираются: их время напоминания остаётся NULL, пока они не изменят настройки.
+    """
+    query = (
+        select(
+            User.id, User.telegram_id, User.notification_days,
+            User.notification_interval_hours, User.next_reminder_at
+        )
+        .where(
+            User.notifications_enabled == True,
+            or_(User.next_reminder_at.is_(None), User.next_reminder_at <= now),
+            or_(User.notification_days != '', User.notification_interval_hours > 0),
+            or_(
+                User.reminder_claimed_at.is_(None),
+                User.reminder_claimed_at <= now - timedelta(minutes=REMINDER_CLAIM_TIMEOUT_MINUTES)
+            )
+        )
+    )
+    async with async_session_factory() as session:
+        result = await session.execute(query)
+        due_users = [
+            {
+                'id': row.id,
+                'telegram_id': row.telegram_id,
+                'notification_days': row.notification_days,
+                'notification_interval_hours': row.notification_interval_hours,
+                'slot': row.next_reminder_at
+            }
+            for row in result
+        ]
+        if not due_users:
             return []
 
-        # Поиск дедлайнов, которые ещё не прошли
-        query = (
-            select(Deadline)
-            .where(
-                Deadline.user_id == user.id,
-                Deadline.due_date >= datetime.now().date(),
-                Deadline.is_trashed == False
+        # Массовое обновление по первичному ключу (executemany)
+        await session.execute(update(User), [
+            {'id': user['id'], 'reminder_claimed_at': now} for user in due_users
+        ])
+        await session.commit()
+        user_cache.invalidate(*(user['telegram_id'] for user in due_users))
+
+    logger.success(f'Пользователей, которым пора напомнить: {len(due_users)}')
+    return due_users
+
+
+async def complete_reminder_claims(user_ids: List[int], claimed_at: datetime):
+    """
+    Завершает рассылку напоминаний пользователям `user_ids` (id в БД), взятым в работу claim_due_reminders
+    в момент `claimed_at`: переносит их время напоминания на следующее после `claimed_at`.
+    Время рассчитывается по текущим настройкам (пользователь мог изменить их, пока шла рассылка).
+    Пользователи, которых после истечения REMINDER_CLAIM_TIMEOUT_MINUTES взял в работу другой запуск, не трогаются.
+    """
+    if not user_ids:
+        return
+    async with async_session_factory() as session:
+        result = await session.execute(
+            select(
+                User.id, User.telegram_id, User.notifications_enabled,
+                User.notification_days, User.notification_interval_hours
+            )
+            .where(User.id.in_(user_ids), User.reminder_claimed_at == claimed_at)
+        )
+        claimed = result.all()
+        if not claimed:
+            return
+
+        # Массовое обновление по первичному ключу (executemany)
+        await session.execute(update(User), [
+            {
+                'id': row.id,
+                'reminder_claimed_at': None,
+                'next_reminder_at': _next_reminder_at(
+                    row.notifications_enabled, row.notification_days, row.notification_interval_hours, claimed_at
                 )
-            .order_by(Deadline.due_date.asc())
+            }
+            for row in claimed
+        ])
+        await session.commit()
+        user_cache.invalidate(*(row.telegram_id for row in claimed))
+
+
+async def get_interval_reminder_candidates(user_ids: List[int]) -> List[Dict]:
+    """
+    Возвращает актуальные дедлайны пользователей `user_ids` (id в БД) для частых напоминаний,
+    сгруппированные по пользователю: [{telegram_id, deadlines}].
+    Всё загружается одним потоковым запросом с JOIN (вместо запроса дедлайнов на каждого пользователя).
+    """
+    query = (
+        select(User.telegram_id, Deadline.course_name, Deadline.task_name, Deadline.due_date)
+        .join(Deadline, Deadline.user_id == User.id)
+        .where(
+            User.id.in_(user_ids),
+            Deadline.due_date >= datetime.now().date(),
+            Deadline.is_trashed == False
+        )
+        .order_by(User.id, Deadline.due_date.asc())
+    )
+
+    candidates = []
+    async with async_session_factory() as session:
+        rows = await session.stream(query)
+        # Строки отсортированы по пользователю, поэтому группировка - за один проход
+        async for row in rows:
+            if not candidates or candidates[-1]['telegram_id'] != row.telegram_id:
+                candidates.append({'telegram_id': row.telegram_id, 'deadlines': []})
+            candidates[-1]['deadlines'].append({
+                'course_name': row.course_name,
+                'task_name': row.task_name,
+                'due_date': row.due_date
+            })
+    return candidates
+
+
+async def get_daily_reminder_candidates(today: date, user_ids: List[int]) -> List[Dict]:
+    """
+    Возвращает дедлайны пользователей `user_ids` (id в БД), по которым может быть положено ежедневное напоминание:
+    [{deadline_id, telegram_id, notification_days, course_name, task_name, due_date, days_left, last_offset}].
+
+    `last_offset` - наименьшее из уже отправленных по журналу sent_reminders "за сколько дней" (или None).
+    В выборку попадают только дедлайны ближайших max(REMINDER_DAY_OPTIONS) дней, по которым с последнего
+    напоминания прошёл хотя бы день, поэтому запрос не перебирает все дедлайны.
+    """
+    days_left = cast(
+        func.julianday(func.date(Deadline.due_date)) - func.julianday(today.isoformat()), Integer
+    ).label('days_left')
+    last_offset = (
+        select(func.min(SentReminder.day_offset))
+        .where(SentReminder.deadline_id == Deadline.id, SentReminder.kind == 'daily')
+        .scalar_subquery()
+        .label('last_offset')
+    )
+
+    query = (
+        select(
+            Deadline.id.label('deadline_id'), User.telegram_id, User.notification_days,
+            Deadline.course_name, Deadline.task_name, Deadline.due_date, days_left, last_offset
+        )
+        .join(User, User.id == Deadline.user_id)
+        .where(
+            User.id.in_(user_ids),
+            User.notification_days != '',
+            Deadline.is_trashed == False,
+            Deadline.due_date >= today,
+            Deadline.due_date < today + timedelta(days=max(REMINDER_DAY_OPTIONS) + 1),
+            or_(last_offset.is_(None), last_offset > days_left)
         )
+        .order_by(User.id, Deadline.due_date.asc())
+    )
+
+    async with async_session_factory() as session:
         result = await session.execute(query)
-        deadlines = result.scalars().all()
-        logger.success(f'Пользователь с telegram_id={telegram_id} имеет {len(deadlines)} дедлайнов')
-        return list(deadlines)
+        candidates = [dict(row._mapping) for row in result]
+
+    logger.success(f'Дедлайнов-кандидатов для ежедневных напоминаний: {len(candidates)}')
+    return candidates
+
+
+async def record_sent_reminders(reminders: List[Tuple[int, str, int]]):
+    """Записывает в журнал отправленные напоминания (deadline_id, вид, за сколько дней); повторы игнорируются."""
+    if not reminders:
+        return
+    async with async_session_factory() as session:
+        query = sqlite_insert(SentReminder).on_conflict_do_nothing(
+            index_elements=['deadline_id', 'kind', 'day_offset']
+        )
+        await session.execute(query, [
+            {'deadline_id': deadline_id, 'kind': kind, 'day_offset': day_offset}
+            for deadline_id, kind, day_offset in reminders
+        ])
+        await session.commit()
+        logger.success(f"В журнал записано {len(reminders)} отправленных напоминаний")
+
+
+async def cleanup_sent_reminders():
+    """Удаляет из журнала напоминания по прошедшим и удалённым дедлайнам."""
+    async with async_session_factory() as session:
+        actual_deadlines = select(Deadline.id).where(Deadline.due_date >= datetime.now().date())
+        result = await session.execute(delete(SentReminder).where(SentReminder.deadline_id.not_in(actual_deadlines)))
+        await session.commit()
+        logger.success(f"Очищено {result.rowcount} записей журнала напоминаний")
 
 
 async def add_custom_deadline(telegram_id: int, course: str, task: str, due_date: datetime):
     """Добавляет один личный дедлайн для пользователя."""
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
+        # id пользователя подставляется прямо в INSERT: если пользователя нет, строка не вставится
+        query = (
+            insert(Deadline)
+            .from_select(
+                ['user_id', 'course_name', 'task_name', 'due_date', 'is_custom'],
+                select(User.id, literal(course), literal(task), literal(due_date, DateTime), literal(True))
+                .where(User.telegram_id == telegram_id)
+            )
+            .returning(Deadline)
+        )
+        new_deadline = (await session.execute(query)).scalars().first()
+        if not new_deadline:
             logger.error(f'Не удалось добавить личный дедлайн для пользователя с telegram_id={telegram_id}, пользователя не существует')
             return None
 
-        new_deadline = Deadline(
-            user_id=user.id,
-            course_name=course,
-            task_name=task,
-            due_date=due_date,
-            is_custom=True
-        )
-        session.add(new_deadline)
         await session.commit()
         logger.success(f'Добавлен личный дедлайн для пользователя с telegram_id={telegram_id}')
         return new_deadline
@@ -313,7 +796,7 @@ async def move_deadline_to_trash(deadline_id: int):
 
 async def toggle_notifications(telegram_id: int) -> bool:
     """Включает/выключает уведомления для пользователя и возвращает новое состояние."""
-    async with async_session_factory() as session:
+    async with async_session_factory(expire_on_commit=False) as session:
         user_result = await session.execute(select(User).where(User.telegram_id == telegram_id))
         user = user_result.scalars().first()
         if not user:
@@ -322,14 +805,17 @@ async def toggle_notifications(telegram_id: int) -> bool:
 
         user.notifications_enabled = not user.notifications_enabled
         new_state = user.notifications_enabled
+        _reschedule_reminders(user)
         await session.commit()
+        # Хэндлер сразу перерисует меню настроек - обновлённый пользователь кладётся в кэш без повторного чтения
+        user_cache.set(telegram_id, user)
         logger.success(f"Пользователь с telegram_id={telegram_id} переключил уведомления на {new_state}")
         return new_state
 
 
 async def update_notification_days(telegram_id: int, day: int) -> str:
     """Добавляет или убирает день из списка уведомлений."""
-    async with async_session_factory() as session:
+    async with async_session_factory(expire_on_commit=False) as session:
         user_result = await session.execute(select(User).where(User.telegram_id == telegram_id))
         user = user_result.scalars().first()
         if not user:
@@ -349,58 +835,48 @@ async def update_notification_days(telegram_id: int, day: int) -> str:
         new_days_list = sorted(list(days_set))
         user.notification_days = ",".join(map(str, new_days_list))
         new_days_str = user.notification_days
+        _reschedule_reminders(user)
         await session.commit()
+        # Хэндлер сразу перерисует меню настроек - обновлённый пользователь кладётся в кэш без повторного чтения
+        user_cache.set(telegram_id, user)
         logger.success(f"Пользователь с telegram_id={telegram_id} обновил уведомления на {new_days_str}")
         return new_days_str
 
 
 async def set_notification_interval(telegram_id: int, hours: int):
     """Устанавливает интервал частых уведомлений для пользователя."""
-    async with async_session_factory() as session:
-        query = (
-            update(User)
-            .where(User.telegram_id == telegram_id)
-            .values(notification_interval_hours=hours)
-        )
-        await session.execute(query)
+    async with async_session_factory(expire_on_commit=False) as session:
+        user_result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        user = user_result.scalars().first()
+        if not user:
+            logger.error(f"Не удалось обновить интервал уведомлений для пользователя с telegram_id={telegram_id}, пользователь не существует")
+            return
+
+        user.notification_interval_hours = hours
+        _reschedule_reminders(user)
         await session.commit()
+        # Хэндлер сразу перерисует меню настроек - обновлённый пользователь кладётся в кэш без повторного чтения
+        user_cache.set(telegram_id, user)
         logger.success(f"Пользователь с telegram_id={telegram_id} обновил интервал уведомлений на {hours} часов")
 
 
 async def delete_all_custom_deadlines(telegram_id: int):
     """Удаляет ВСЕ личные (is_custom=True) дедлайны пользователя."""
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user:
-            logger.error(f"Не удалось удалить все личные дедлайны пользователя с telegram_id={telegram_id}, пользователь не существует")
-            return False
-
         query = delete(Deadline).where(
-            Deadline.user_id == user.id,
+            Deadline.user_id == _user_id_subquery(telegram_id),
             Deadline.is_custom == True
         )
-        await session.execute(query)
+        result = await session.execute(query)
+        # Пустой результат - либо нечего удалять, либо пользователя нет (редкий случай, проверяется отдельно)
+        if not result.rowcount and not await session.scalar(select(User.id).where(User.telegram_id == telegram_id)):
+            logger.error(f"Не удалось удалить все личные дедлайны пользователя с telegram_id={telegram_id}, пользователь не существует")
+            return False
         await session.commit()
         logger.success(f'Все личные дедлайны удалены пользователю с telegram_id={telegram_id}')
         return True
 
 
-async def get_trashed_deadlines_from_db(telegram_id: int) -> list[Deadline]:
-    """Получает все дедлайны пользователя из корзины."""
-    async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user: return []
-        query = (
-            select(Deadline)
-            .where(Deadline.user_id == user.id, Deadline.is_trashed == True)
-            .order_by(Deadline.due_date.desc())
-        )
-        result = await session.execute(query)
-        deadlines = result.scalars().all()
-        logger.success(f'Пользователь с telegram_id={telegram_id} получил {len(deadlines)} дедлайнов из корзины')
-        return list(deadlines)
-
-
 async def restore_deadline_from_trash(deadline_id: int):
     """Восстанавливает дедлайн из корзины."""
     async with async_session_factory() as session:
@@ -413,11 +889,16 @@ async def restore_deadline_from_trash(deadline_id: int):
 async def empty_trash_for_user(telegram_id: int):
     """Перманентно удаляет все дедлайны из корзины пользователя."""
     async with async_session_factory() as session:
-        user = await get_user_by_telegram_id(telegram_id)
-        if not user: return False
-        query = delete(Deadline).where(Deadline.user_id == user.id, Deadline.is_trashed == True)
+        # Удалённые из корзины дедлайны из ЛК вернутся при следующей синхронизации - её нельзя пропускать
+        result = await session.execute(
+            update(User).where(User.telegram_id == telegram_id).values(deadlines_fingerprint=None)
+        )
+        if not result.rowcount:
+            return False
+        query = delete(Deadline).where(Deadline.user_id == _user_id_subquery(telegram_id), Deadline.is_trashed == True)
         await session.execute(query)
         await session.commit()
+        user_cache.invalidate(telegram_id)
         logger.success(f'Корзина очищена для пользователя с telegram_id={telegram_id}')
         return True
 
@@ -425,10 +906,74 @@ async def empty_trash_for_user(telegram_id: int):
 async def cleanup_expired_trashed_deadlines():
     """Автоматически удаляет просроченные дедлайны из корзин всех пользователей."""
     async with async_session_factory() as session:
-        query = delete(Deadline).where(
-            Deadline.is_trashed == True,
-            Deadline.due_date < datetime.now().date()
+        expired_condition = (Deadline.is_trashed == True) & (Deadline.due_date < datetime.now().date())
+
+        # Сброс отпечатков затронутых пользователей, чтобы следующая синхронизация прошла полностью
+        await session.execute(
+            update(User)
+            .where(User.id.in_(select(Deadline.user_id).where(expired_condition, Deadline.is_custom == False)))
+            .values(deadlines_fingerprint=None)
         )
+
+        query = delete(Deadline).where(expired_condition)
         result = await session.execute(query)
         await session.commit()
+        # Отпечатки сброшены у заранее неизвестного круга пользователей
+        user_cache.clear()
         logger.success(f"Очищено {result.rowcount} просроченных дедлайнов из корзин.")
+
+
+async def get_fsm_record(key: str) -> Optional[FsmState]:
+    """Возвращает запись состояния диалога по ключу FSM или None."""
+    async with async_session_factory() as session:
+        return await session.get(FsmState, key)
+
+
+async def set_fsm_state(key: str, state: Optional[str]):
+    """Сохраняет состояние диалога, не трогая его данные."""
+    async with async_session_factory() as session:
+        now = datetime.now()
+        query = (
+            sqlite_insert(FsmState)
+            .values(key=key, state=state, updated_at=now)
+            .on_conflict_do_update(index_elements=[FsmState.key], set_={"state": state, "updated_at": now})
+        )
+        await session.execute(query)
+        await session.commit()
+
+
+async def set_fsm_data(key: str, data: Dict):
+    """Шифрует и сохраняет данные диалога (пустые данные хранятся как NULL), не трогая его состояние."""
+    async with async_session_factory() as session:
+        now = datetime.now()
+        encrypted_data = encrypt_data(json.dumps(data, ensure_ascii=False)) if data else None
+        query = (
+            sqlite_insert(FsmState)
+            .values(key=key, encrypted_data=encrypted_data, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=[FsmState.key], set_={"encrypted_data": encrypted_data, "updated_at": now}
+            )
+        )
+        await session.execute(query)
+        await session.commit()
+
+
+async def delete_fsm_record(key: str):
+    """Удаляет запись состояния диалога (состояние и данные) по ключу FSM."""
+    async with async_session_factory() as session:
+        await session.execute(delete(FsmState).where(FsmState.key == key))
+        await session.commit()
+
+
+async def cleanup_stale_fsm_states(before: datetime):
+    """Удаляет состояния диалогов, не менявшиеся с `before`, и пустые записи (диалог завершён)."""
+    async with async_session_factory() as session:
+        query = delete(FsmState).where(
+            or_(
+                FsmState.updated_at < before,
+                FsmState.state.is_(None) & FsmState.encrypted_data.is_(None)
+            )
+        )
+        result = await session.execute(query)
+        await session.commit()
+        logger.success(f"Очищено {result.rowcount} устаревших и пустых состояний диалогов")
@@ -1,13 +1,35 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import date
-import requests
+import asyncio
+import hashlib
+import json
+import random
 import re
 
+import aiohttp
+import lxml.etree
+import lxml.html
+
 from bs4 import BeautifulSoup
+from http.cookies import Morsel
 from loguru import logger
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable
+from yarl import URL
+
+from src.config import (
+    LK_RATE_LIMIT, LK_RATE_BURST, LK_BREAKER_THRESHOLD, LK_BREAKER_COOLDOWN,
+    LK_CONNECT_TIMEOUT, LK_READ_TIMEOUTS, LK_GET_RETRIES, LK_RETRY_BACKOFF,
+    LK_MAX_SESSIONS, LK_INTERACTIVE_RESERVED
+)
+from src.utils.concurrency import SlotPool, run_parser
+from src.utils.ratelimit import TokenBucket, CircuitBreaker
 
 BASE_URL = "https://pro.guap.ru"
 
+# Парсер для BeautifulSoup: lxml (написан на C) разбирает страницы быстрее встроенного html.parser
+HTML_PARSER = "lxml"
+
 
 def _get_current_semester_id() -> Tuple[int, str]:
     """
@@ -45,48 +67,200 @@ def _get_current_semester_id() -> Tuple[int, str]:
     return semester_id, semester_name
 
 
-def _get_session() -> requests.Session:
-    """Создаёт и настраивает сессию requests."""
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
-    })
+# Сетевые ошибки aiohttp и истечение таймаута - одинаково "ЛК не ответил"
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+# Причины сбоя, при которых GET-запрос имеет смысл повторить
+RETRYABLE_REASONS = ("timeout", "refused", "server_error")
+
+# Все запросы к ЛК (фоновая синхронизация, /update, регистрация) проходят через общие лимитер и предохранитель
+lk_rate_limiter = TokenBucket(rate=LK_RATE_LIMIT, capacity=LK_RATE_BURST)
+lk_circuit_breaker = CircuitBreaker("ЛК ГУАП", failure_threshold=LK_BREAKER_THRESHOLD, cooldown=LK_BREAKER_COOLDOWN)
+
+# Одновременные сеансы работы с ЛК; часть слотов недоступна фоновой синхронизации и ждёт регистрацию и /update
+lk_sessions = SlotPool(size=LK_MAX_SESSIONS, reserved=LK_INTERACTIVE_RESERVED)
+
+# Выполняется ли текущий сеанс ЛК для пользователя, который ждёт ответа (его запросы идут вне очереди лимитера)
+_interactive_session: ContextVar[bool] = ContextVar("lk_interactive_session", default=False)
+
+
+class LkUnavailableError(Exception):
+    """
+    ЛК не ответил на запрос. Причина `reason` сохраняется в БД как итог неудачной синхронизации:
+    'timeout' - истёк таймаут, 'refused' - соединение не установлено или оборвано,
+    'server_error' - ответ 5xx, 'http_error' - прочие ошибки HTTP,
+    'circuit_open' - запросы приостановлены предохранителем после серии сбоев.
+    """
+
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def _classify_network_error(error: BaseException) -> str:
+    """Сводит сетевую ошибку aiohttp к причине сбоя для LkUnavailableError."""
+    if isinstance(error, asyncio.TimeoutError):  # В т.ч. ServerTimeoutError и ConnectionTimeoutError
+        return "timeout"
+    if isinstance(error, aiohttp.ClientResponseError):
+        return "server_error" if error.status >= 500 else "http_error"
+    return "refused"
+
+
+def _get_session(cookies: Optional[List[Dict[str, str]]] = None) -> aiohttp.ClientSession:
+    """
+    Создаёт и настраивает aiohttp-сессию.
+    У каждой сессии свой cookie jar, поэтому авторизации разных пользователей не смешиваются.
+    Если переданы cookies с прошлой синхронизации, сессия стартует уже авторизованной.
+    """
+    session = aiohttp.ClientSession(
+        headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+        },
+        cookie_jar=aiohttp.CookieJar()
+    )
+    for cookie in cookies or []:
+        morsel = Morsel()
+        morsel.set(cookie['name'], cookie['value'], cookie['value'])
+        morsel['domain'] = cookie['domain']
+        morsel['path'] = cookie['path'] or '/'
+        session.cookie_jar.update_cookies(
+            {cookie['name']: morsel},
+            response_url=URL(f"https://{cookie['domain'].lstrip('.')}/")
+        )
     return session
 
 
-def _perform_login(session: requests.Session, username: str, password: str) -> bool:
+def _dump_cookies(session: aiohttp.ClientSession) -> List[Dict[str, str]]:
+    """Выгружает cookies сессии (ЛК и Keycloak) в сериализуемый вид для сохранения в БД."""
+    return [
+        {'name': morsel.key, 'value': morsel.value, 'domain': morsel['domain'], 'path': morsel['path']}
+        for morsel in session.cookie_jar
+    ]
+
+
+@asynccontextmanager
+async def _lk_request(session: aiohttp.ClientSession, method: str, url: str, phase: str, **kwargs):
     """
-    Выполняет авторизацию в личном кабинете.
-    Возвращает True в случае успеха, False в случае ошибки.
+    Выполняет запрос к ЛК через общий лимитер частоты и предохранитель с таймаутами этапа `phase`
+    ('login', 'profile', 'groups', 'tasks').
+
+    Ответы 5xx, таймауты и ошибки соединения (в том числе при чтении тела ответа) считаются сбоями ЛК
+    и превращаются в LkUnavailableError с причиной; при разомкнутом предохранителе запрос не отправляется.
     """
+    await lk_rate_limiter.acquire(priority=_interactive_session.get())
+    ticket = lk_circuit_breaker.before_request()
+    if ticket is None:
+        raise LkUnavailableError("circuit_open", "ЛК временно недоступен, запросы приостановлены")
+
+    timeout = aiohttp.ClientTimeout(connect=LK_CONNECT_TIMEOUT, sock_read=LK_READ_TIMEOUTS[phase])
     try:
-        # Получение страницы, чтобы найти форму для POST-запроса
-        login_page_response = session.get(f"{BASE_URL}/inside/profile")
-        login_page_response.raise_for_status()
+        response = await session.request(method, url, timeout=timeout, **kwargs)
+    except asyncio.CancelledError:
+        # Отмена со стороны бота ничего не говорит о состоянии ЛК: освобождается только место пробного запроса
+        lk_circuit_breaker.record_cancelled(ticket)
+        raise
+    except NETWORK_ERRORS as e:
+        lk_circuit_breaker.record_failure(ticket)
+        raise LkUnavailableError(_classify_network_error(e), f"{phase}: {e!r}") from e
+
+    if response.status >= 500:
+        lk_circuit_breaker.record_failure(ticket)
+    else:
+        lk_circuit_breaker.record_success(ticket)
 
-        soup = BeautifulSoup(login_page_response.text, 'html.parser')
-        form = soup.find('form', id='kc-form-login')
-        if not form:
-            logger.error("Не найдена форма логина")
-            return False
+    try:
+        yield response
+    except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError) as e:
+        # Ответ начал приходить, но оборвался или "завис" при чтении тела
+        lk_circuit_breaker.record_failure(ticket)
+        raise LkUnavailableError(_classify_network_error(e), f"{phase}: {e!r}") from e
+    finally:
+        response.release()
 
-        action_url = form['action']
-        login_data = {'username': username, 'password': password, 'credentialId': ''}
 
-        # Отправление данных для авторизации
-        auth_response = session.post(action_url, data=login_data, allow_redirects=False)
+async def _fetch_text(session: aiohttp.ClientSession, url: str, phase: str) -> str:
+    """
+    Выполняет GET-запрос и возвращает тело ответа; при неудаче выбрасывает LkUnavailableError.
+    Таймауты, обрывы соединения и ответы 5xx повторяются до LK_GET_RETRIES раз
+    с экспоненциальной паузой со случайным разбросом (чтобы повторы разных пользователей не совпадали).
+    """
+    for attempt in range(LK_GET_RETRIES + 1):
+        try:
+            async with _lk_request(session, 'GET', url, phase) as response:
+                if response.status >= 400:
+                    reason = "server_error" if response.status >= 500 else "http_error"
+                    raise LkUnavailableError(reason, f"{phase}: ЛК ответил {response.status}")
+                return await response.text()
+        except LkUnavailableError as e:
+            if e.reason not in RETRYABLE_REASONS or attempt == LK_GET_RETRIES:
+                raise
+            delay = random.uniform(0, LK_RETRY_BACKOFF * 2 ** attempt)
+            logger.warning(f"Сбой запроса к ЛК ({e}), повтор {attempt + 1}/{LK_GET_RETRIES} через {delay:.1f} c")
+            await asyncio.sleep(delay)
+
+
+def _find_login_action(login_page_text: str) -> Optional[str]:
+    """Возвращает адрес отправки формы входа Keycloak или None, если формы на странице нет."""
+    form = BeautifulSoup(login_page_text, HTML_PARSER).find('form', id='kc-form-login')
+    return form.get('action') if form else None
+
+
+async def _perform_login(
+    session: aiohttp.ClientSession,
+    username: str,
+    password: str,
+    login_page_text: str,
+    target_url: str
+) -> Optional[str]:
+    """
+    Выполняет авторизацию в личном кабинете через форму Keycloak со страницы `login_page_text`.
+    Возвращает HTML страницы `target_url` (она же - проверка входа) в случае успеха, None при неверных данных.
+    Сетевые сбои не маскируются под неверный пароль: выбрасывается LkUnavailableError.
+    """
+    action_url = await run_parser(_find_login_action, login_page_text)
+    if not action_url:
+        logger.error("Не найдена форма логина")
+        return None
+
+    login_data = {'username': username, 'password': password, 'credentialId': ''}
+
+    # Отправление данных для авторизации (cookies сессии сохраняются в cookie jar).
+    # POST не идемпотентен, поэтому не повторяется
+    async with _lk_request(session, 'POST', action_url, 'login', data=login_data, allow_redirects=False):
+        pass
+
+    # Проверка успеха, запрашивая снова нужную страницу
+    check_text = await _fetch_text(session, target_url, 'login')
+    if 'kc-form-login' in check_text:
+        logger.error("Неверный логин или пароль")
+        return None
+    logger.success(f"Пользователь {username} успешно авторизован")
+    return check_text
+
+
+async def _open_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    phase: str,
+    username: str,
+    password: str,
+    on_login: Optional[Callable[[], None]] = None
+) -> Optional[str]:
+    """
+    Открывает страницу ЛК, выполняя полный вход только если сохранённые cookies не подошли.
+    Возвращает HTML страницы или None, если авторизоваться не удалось.
+    `on_login` вызывается перед полным входом.
+    """
+    page_text = await _fetch_text(session, url, phase)
 
-        # Проверка успеха, запрашивая снова страницу профиля
-        check_response = session.get(f"{BASE_URL}/inside/profile")
-        if 'kc-form-login' in check_response.text:
-            logger.error("Неверный логин или пароль")
-            return False
-        logger.success(f"Пользователь {username} успешно авторизован")
-        return True
+    # Вместо страницы отдана форма входа - сессии нет или она истекла
+    if 'kc-form-login' in page_text:
+        if on_login:
+            on_login()
+        return await _perform_login(session, username, password, page_text, url)
 
-    except requests.RequestException as e:
-        logger.error(f"Сетевая ошибка при авторизации: {e}")
-        return False
+    logger.info(f"Сохранённая сессия пользователя {username} действительна, вход не требуется")
+    return page_text
 
 
 def _extract_full_name(profile_soup: BeautifulSoup) -> Optional[str]:
@@ -97,109 +271,228 @@ def _extract_full_name(profile_soup: BeautifulSoup) -> Optional[str]:
     return None
 
 
-def _extract_profile_id(session: requests.Session, full_name: str) -> Optional[str]:
-    """Извлекает ID профиля, используя ФИО и страницу группы."""
-    try:
-        group_page_response = session.get(f"{BASE_URL}/inside/student/groups")
-        group_page_response.raise_for_status()
-        group_soup = BeautifulSoup(group_page_response.text, 'html.parser')
-
-        student_links = group_soup.select('table tbody tr td a')
-        for link in student_links:
-            if full_name in link.get_text(strip=True) and 'href' in link.attrs:
-                match = re.search(r'/profile/(\d+)', link['href'])
-                if match:
-                    logger.success(f"Найден ID профиля пользователя {full_name}: {match.group(1)}")
-                    return match.group(1)
-        return None
-    except requests.RequestException as e:
-        logger.error(f"Сетевая ошибка при поиске ID на странице группы: {e}")
-        return None
-
+def _find_profile_id(group_page_text: str, full_name: str) -> Optional[str]:
+    """Ищет ID профиля пользователя по ФИО в списке группы."""
+    group_soup = BeautifulSoup(group_page_text, HTML_PARSER)
 
-def _extract_deadlines(session: requests.Session) -> Optional[List[Dict[str, str]]]:
-    """Парсит страницу с заданиями и возвращает список дедлайнов."""
-    try:
-        current_semester_id, _ = _get_current_semester_id() # Требуется только ID, название игнорируется
-        print(f"Текущий семестр ID: {current_semester_id}")
+    student_links = group_soup.select('table tbody tr td a')
+    for link in student_links:
+        if full_name in link.get_text(strip=True) and 'href' in link.attrs:
+            match = re.search(r'/profile/(\d+)', link['href'])
+            if match:
+                return match.group(1)
+    return None
 
-        tasks_url = f"{BASE_URL}/inside/student/tasks/?semester={current_semester_id}&subject=0&type=0&showStatus=1&perPage=200"
-        response = session.get(tasks_url)
-        response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        deadlines = []
+def _parse_profile(profile_text: str, group_page_text: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Разбирает страницы профиля и группы, возвращает (ID профиля, ФИО).
+    Вызывается через run_parser, поэтому должна оставаться функцией уровня модуля (для пула процессов).
+    """
+    full_name = _extract_full_name(BeautifulSoup(profile_text, HTML_PARSER))
+    if not full_name or group_page_text is None:
+        return None, full_name
+    return _find_profile_id(group_page_text, full_name), full_name
 
-        # Поиск всех строк таблицы
-        rows = soup.find_all('tr')
-        for row in rows:
-            cols = row.find_all('td')
-
-            # Проверка, что это строка с данными (в ней должно быть достаточно колонок)
-            if len(cols) < 8:  # В таблице ГУАП обычно 10 колонок
-                continue
-
-            # Колонка 2: "Дисциплина"
-            subject_tag = cols[1].find('a')  # Поиск ссылки внутри 2-й ячейки (индекс 1)
-            if not subject_tag:
-                continue
-            subject = subject_tag.get_text(strip=True)
-
-            # Колонка 4: "Название" (задания)
-            task_tag = cols[3].find('a')  # Поиск ссылки внутри 4-й ячейки (индекс 3)
-            if not task_tag:
-                continue
-            task = task_tag.get_text(strip=True)
-
-            # Колонка 8: "Предельная дата"
-            date_text = cols[7].get_text(strip=True)  # Поиск текста внутри 8-й ячейки (индекс 7)
-
-            # Если дата = "Не указана" или пустая - пропуск этого "дедлайна"
-            if not date_text or date_text == "Не указана":
-                continue
-
-            # Если есть дата - добавляем дедлайн в список
-            deadlines.append({
-                'subject': subject,
-                'task': task,
-                'due_date': date_text
-            })
 
-        logger.success(f"Парсер нашел {len(deadlines)} дедлайнов")
-        return deadlines
-    except requests.RequestException as e:
-        logger.error(f"Сетевая ошибка при парсинге дедлайнов: {e}")
+async def _fetch_group_page(session: aiohttp.ClientSession) -> Optional[str]:
+    """Загружает страницу группы (по ней ищется ID профиля); при сетевой ошибке возвращает None."""
+    try:
+        return await _fetch_text(session, f"{BASE_URL}/inside/student/groups", 'groups')
+    except LkUnavailableError as e:
+        logger.error(f"Сетевая ошибка при загрузке страницы группы: {e}")
         return None
 
 
-def parse_lk_data(username: str, password: str) -> Optional[Tuple[List[Dict], Optional[str], Optional[str]]]:
+def _get_text(element: lxml.html.HtmlElement) -> str:
+    """Текст элемента lxml - аналог BeautifulSoup.get_text(strip=True)."""
+    return "".join(part.strip() for part in element.itertext())
+
+
+def _parse_deadlines_table(tasks_page_text: str) -> List[Dict[str, str]]:
     """
-    Основная "публичная" функция. Координирует процесс парсинга.
-    Возвращает кортеж (дедлайны, ID профиля, ФИО) или None в случае ошибки.
+    Разбирает HTML страницы с заданиями и возвращает список дедлайнов.
+    Таблица разбирается напрямую через lxml, без построения дерева BeautifulSoup:
+    это основная нагрузка на CPU при синхронизации (см. benchmarks/bench_tasks_parsing.py).
+    Вызывается через run_parser, поэтому должна оставаться функцией уровня модуля (для пула процессов).
     """
-    session = _get_session()
+    if not tasks_page_text.strip():
+        return []
+
+    root = lxml.html.fromstring(tasks_page_text)
+    # BeautifulSoup не включает содержимое скриптов и стилей в get_text - здесь так же
+    lxml.etree.strip_elements(root, 'script', 'style', with_tail=False)
+    deadlines = []
+
+    # Поиск всех строк таблицы
+    for row in root.iter('tr'):
+        cols = list(row.iter('td'))
+
+        # Проверка, что это строка с данными (в ней должно быть достаточно колонок)
+        if len(cols) < 8:  # В таблице ГУАП обычно 10 колонок
+            continue
+
+        # Колонка 2: "Дисциплина"
+        subject_tag = next(cols[1].iter('a'), None)  # Поиск ссылки внутри 2-й ячейки (индекс 1)
+        if subject_tag is None:
+            continue
+        subject = _get_text(subject_tag)
+
+        # Колонка 4: "Название" (задания)
+        task_tag = next(cols[3].iter('a'), None)  # Поиск ссылки внутри 4-й ячейки (индекс 3)
+        if task_tag is None:
+            continue
+        task = _get_text(task_tag)
+
+        # Колонка 8: "Предельная дата"
+        date_text = _get_text(cols[7])  # Поиск текста внутри 8-й ячейки (индекс 7)
+
+        # Если дата = "Не указана" или пустая - пропуск этого "дедлайна"
+        if not date_text or date_text == "Не указана":
+            continue
 
-    # Авторизация
-    if not _perform_login(session, username, password):
+        # Если есть дата - добавляем дедлайн в список
+        deadlines.append({
+            'subject': subject,
+            'task': task,
+            'due_date': date_text
+        })
+
+    return deadlines
+
+
+def _get_tasks_url() -> str:
+    """Возвращает адрес страницы заданий текущего семестра."""
+    current_semester_id, _ = _get_current_semester_id() # Требуется только ID, название игнорируется
+    return f"{BASE_URL}/inside/student/tasks/?semester={current_semester_id}&subject=0&type=0&showStatus=1&perPage=200"
+
+
+async def _fetch_tasks_page(session: aiohttp.ClientSession) -> Optional[str]:
+    """Загружает страницу с заданиями; при сетевой ошибке возвращает None."""
+    try:
+        return await _fetch_text(session, _get_tasks_url(), 'tasks')
+    except LkUnavailableError as e:
+        logger.error(f"Сетевая ошибка при загрузке страницы заданий: {e}")
         return None
 
-    # Получаение страницы профиля один раз
-    profile_response = session.get(f"{BASE_URL}/inside/profile")
-    if not profile_response.ok:
-        logger.error(f"Не удалось получить страницу профиля: {username}")
-        return [], None, None
-    profile_soup = BeautifulSoup(profile_response.text, 'html.parser')
 
-    # Извлечение данных
-    full_name = _extract_full_name(profile_soup)
-    profile_id = _extract_profile_id(session, full_name) if full_name else None
-    deadlines = _extract_deadlines(session)
+def get_deadlines_fingerprint(deadlines: List[Dict[str, str]]) -> str:
+    """
+    Возвращает отпечаток (SHA-256) списка дедлайнов из ЛК.
+    Порядок строк в таблице не влияет на результат: совпадение отпечатков с прошлой
+    синхронизацией означает, что сверка с БД ничего не изменит.
+    """
+    normalized = sorted((d['subject'], d['task'], d['due_date']) for d in deadlines)
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode()).hexdigest()
+
 
-    # Если парсинг дедлайнов не удался, то возвращается пустой список
-    if deadlines is None:
+async def parse_lk_data(
+    username: str,
+    password: str,
+    cookies: Optional[List[Dict[str, str]]] = None,
+    interactive: bool = False
+) -> Optional[Tuple[List[Dict], Optional[str], Optional[str], List[Dict[str, str]]]]:
+    """
+    Основная "публичная" функция. Координирует процесс парсинга.
+    Возвращает кортеж (дедлайны, ID профиля, ФИО, cookies сессии) или None, если войти не удалось.
+    Если ЛК не ответил (таймаут, обрыв, 5xx, разомкнут предохранитель), выбрасывает LkUnavailableError.
+
+    Все запросы выполняются асинхронно (aiohttp), а разбор тяжёлых страниц - в отдельном пуле (run_parser),
+    поэтому множество синхронизаций может идти на одном event loop, не задерживая ответы бота.
+    Cookies из прошлого вызова позволяют пропустить вход через Keycloak (три запроса),
+    пока ЛК их принимает. `interactive=True` (пользователь ждёт ответа) даёт доступ к резерву lk_sessions
+    и пропускает запросы вне очереди лимитера частоты.
+    """
+    interactive_token = _interactive_session.set(interactive)
+    try:
+        async with lk_sessions.slot(interactive), _get_session(cookies) as session:
+            # Авторизация (или переиспользование сохранённой сессии) и страница профиля
+            profile_text = await _open_page(session, f"{BASE_URL}/inside/profile", 'profile', username, password)
+            if profile_text is None:
+                return None
+            group_page_text = await _fetch_group_page(session)
+            tasks_page_text = await _fetch_tasks_page(session)
+            session_cookies = _dump_cookies(session)
+    finally:
+        _interactive_session.reset(interactive_token)
+
+    # Разбор - уже после закрытия сессии, чтобы не держать слот ЛК, пока страницы ждут свободный воркер пула
+    profile_id, full_name = await run_parser(_parse_profile, profile_text, group_page_text)
+
+    # Если загрузить страницу заданий не удалось, то возвращается пустой список
+    if tasks_page_text is None:
         logger.error(f"Не удалось парсить дедлайны пользователя {username}")
         deadlines = []
+    else:
+        deadlines = await run_parser(_parse_deadlines_table, tasks_page_text)
+        logger.success(f"Парсер нашел {len(deadlines)} дедлайнов")
 
     logger.success(f"Найдена публичная информация о пользователе {username}: ID={profile_id}, ФИО='{full_name}', Дедлайнов={len(deadlines)}")
 
-    return deadlines, profile_id, full_name
+    return deadlines, profile_id, full_name, session_cookies
+
+
+async def fetch_lk_deadlines(
+    username: str,
+    password: str,
+    cookies: Optional[List[Dict[str, str]]] = None,
+    interactive: bool = False,
+    on_phase: Optional[Callable[[str], None]] = None
+) -> Optional[Tuple[List[Dict], List[Dict[str, str]]]]:
+    """
+    Облегчённый вариант parse_lk_data для плановой синхронизации: только дедлайны, без ФИО и ID профиля.
+    Возвращает кортеж (дедлайны, cookies сессии) или None, если войти не удалось.
+    Если ЛК не ответил (таймаут, обрыв, 5xx, разомкнут предохранитель), выбрасывает LkUnavailableError.
+
+    Страницы профиля и группы не загружаются: при действительной сессии синхронизация - это
+    один запрос к странице заданий, а вход через Keycloak выполняется прямо на ней.
+
+    `on_phase` получает этапы работы для показа пользователю: 'login' - полный вход (сохранённая сессия не подошла),
+    'parse' - страница заданий получена и разбирается.
+    """
+    interactive_token = _interactive_session.set(interactive)
+    try:
+        async with lk_sessions.slot(interactive), _get_session(cookies) as session:
+            tasks_page_text = await _open_page(
+                session, _get_tasks_url(), 'tasks', username, password,
+                on_login=(lambda: on_phase('login')) if on_phase else None
+            )
+            if tasks_page_text is None:
+                return None
+            session_cookies = _dump_cookies(session)
+    finally:
+        _interactive_session.reset(interactive_token)
+
+    if on_phase:
+        on_phase('parse')
+
+    # Разбор - уже после закрытия сессии, чтобы не держать слот ЛК, пока страница ждёт свободный воркер пула
+    deadlines = await run_parser(_parse_deadlines_table, tasks_page_text)
+
+    logger.success(f"Парсер нашел {len(deadlines)} дедлайнов пользователя {username}")
+
+    return deadlines, session_cookies
+
+
+async def fetch_lk_profile(
+    username: str,
+    password: str,
+    cookies: Optional[List[Dict[str, str]]] = None
+) -> Optional[Tuple[Optional[str], Optional[str], List[Dict[str, str]]]]:
+    """
+    Облегчённый вариант parse_lk_data для обновления профиля: только ФИО и ID профиля, без таблицы заданий.
+    Возвращает кортеж (ID профиля, ФИО, cookies сессии) или None, если войти не удалось.
+    Если ЛК не ответил (таймаут, обрыв, 5xx, разомкнут предохранитель), выбрасывает LkUnavailableError.
+    """
+    async with lk_sessions.slot(), _get_session(cookies) as session:
+        profile_text = await _open_page(session, f"{BASE_URL}/inside/profile", 'profile', username, password)
+        if profile_text is None:
+            return None
+        group_page_text = await _fetch_group_page(session)
+        session_cookies = _dump_cookies(session)
+
+    profile_id, full_name = await run_parser(_parse_profile, profile_text, group_page_text)
+
+    logger.success(f"Профиль пользователя {username} обновлён: ID={profile_id}, ФИО='{full_name}'")
+
+    return profile_id, full_name, session_cookies
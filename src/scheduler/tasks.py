@@ -1,37 +1,143 @@
 from src.database.queries import (
-    get_all_users, get_user_by_telegram_id, get_user_deadlines_from_db,
-    update_user_deadlines, cleanup_expired_trashed_deadlines
+    get_all_users, get_users_in_sync_window, get_user_by_telegram_id, claim_due_reminders, complete_reminder_claims,
+    get_interval_reminder_candidates, get_daily_reminder_candidates, record_sent_reminders, cleanup_sent_reminders,
+    update_user_deadlines, cleanup_expired_trashed_deadlines, cleanup_stale_fsm_states,
+    set_lk_cookies, replace_lk_cookies,
+    mark_deadlines_checked, set_user_profile, set_last_sync_error
+)
+from src.parser.scraper import (
+    fetch_lk_profile, fetch_lk_deadlines, get_deadlines_fingerprint,
+    LkUnavailableError, lk_circuit_breaker
 )
-from src.parser.scraper import parse_lk_data
 from src.utils.crypto import decrypt_data
+from src.bot.outbox import Outbox
+from src.bot.progress import SyncProgress
+from src.database.models import SYNC_PERIOD_SECONDS
+from src.config import (
+    SYNC_WORKERS, SYNC_USER_TIMEOUT, SYNC_SLICES, REMINDER_CATCHUP_DAYS, REMINDER_DAILY_HOUR, FSM_STATE_TTL_HOURS
+)
 
 from cryptography.fernet import InvalidToken
-from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable
+from datetime import datetime, timedelta
 
 from loguru import logger
-from aiogram import Bot
 import asyncio
+import json
+import time
+
+# По скольку пользователей загружать дедлайны для напоминаний одним запросом (ограничение SQLite на число параметров)
+REMINDER_BATCH_SIZE = 500
+
+# Как часто запускается синхронизация очередной части пользователей (в секундах)
+SYNC_SLICE_SECONDS = SYNC_PERIOD_SECONDS / SYNC_SLICES
+
+# Смещение внутри часа, до которого пользователи уже синхронизированы (None - запусков ещё не было)
+_synced_up_to: Optional[int] = None
+
+# Итоги синхронизации по запросу пользователя (кроме 'ok' - он зависит от числа новых дедлайнов)
+UPDATE_RESULT_TEXTS = {
+    "lk_unavailable": "⏳ Личный кабинет ГУАП сейчас не отвечает. Попробуйте обновить дедлайны немного позже.",
+    "bad_key": "⛔ Не удалось прочитать ваши сохранённые данные от личного кабинета — "
+               "возникла проблема с ключом шифрования.\n\n"
+               "🔑 Пожалуйста, пройдите регистрацию заново: команда /stop (удалит ваши данные), "
+               "а затем /start.",
+    "auth_failed": "⛔ Не удалось войти в личный кабинет с сохранёнными данными.\n\n"
+                   "🔑 Если вы меняли пароль, пройдите регистрацию заново: команда /stop, а затем /start.",
+    "no_user": "⛔ Не удалось обновить дедлайны, вы не авторизованы в личный кабинет!",
+    "no_credentials": "⛔ Не удалось обновить дедлайны, вы не авторизованы в личный кабинет!",
+    "error": "⚠️ Не удалось обновить дедлайны из-за внутренней ошибки. Попробуйте немного позже.",
+}
+
+# Обновления по запросу пользователя, выполняющиеся в фоне: telegram_id -> задача
+# (ссылки ещё и не дают сборщику мусора удалить задачи)
+_user_updates: Dict[int, asyncio.Task] = {}
+
+
+def _read_lk_cookies(user) -> Optional[List[Dict[str, str]]]:
+    """Расшифровывает сохранённую сессию ЛК; битые или нерасшифровываемые cookies просто приводят к полному входу."""
+    if not user.encrypted_lk_cookies:
+        return None
+    try:
+        return json.loads(decrypt_data(user.encrypted_lk_cookies))
+    except (InvalidToken, ValueError):
+        logger.warning(f"Не удалось прочитать сохранённую сессию ЛК пользователя {user.telegram_id}, будет выполнен вход")
+        return None
 
 
-async def update_user_deadlines_and_notify(bot: Bot, user_id: int, force_notify: bool = False):
+class _SyncFlight:
+    """
+    Идущая синхронизация пользователя, общая для всех, кто запросил её, пока она не завершилась.
+    Задача отменяется, если её перестали ждать все (например, у всех истёк таймаут)
+    или её заменила приоритетная синхронизация (superseded, см. _join_sync).
+    Этапы синхронизации показываются во всех сообщениях о ходе обновления, подключённых к ней.
     """
-    Задача для обновления дедлайнов пользователя
 
-    :param bot: Бот для отправки уведомлений
-    :param user_id: ID пользователя
-    :param force_notify: Флаг, указывающий, будет ли отправляться уведомление если дедлайны не обновились
+    def __init__(self, user_id: int, interactive: bool):
+        self.user_id = user_id
+        self.interactive = interactive
+        self.superseded = False
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.current_phase = "queued"
+        self.observers: List[SyncProgress] = []
+
+    def attach(self, progress: SyncProgress):
+        self.observers.append(progress)
+        progress.phase(self.current_phase)
+
+    def report(self, phase: str):
+        self.current_phase = phase
+        for progress in self.observers:
+            progress.phase(phase)
+
+    def retire(self):
+        """Убирает синхронизацию из идущих: новые запросы к ней больше не присоединятся."""
+        if _syncs_in_flight.get(self.user_id) is self:
+            del _syncs_in_flight[self.user_id]
+
+    async def wait(self):
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        finally:
+            self.waiters -= 1
+            if self.waiters == 0 and not self.task.done():
+                # Сначала убирается из идущих: запрос, пришедший до завершения отмены, начнёт новую синхронизацию,
+                # а не получит CancelledError от отменённой
+                self.retire()
+                self.task.cancel()
+
+
+# Синхронизации с ЛК, идущие сейчас: telegram_id -> общая синхронизация
+_syncs_in_flight: Dict[int, _SyncFlight] = {}
+
+# Этапы, на которых синхронизация ещё ждёт ЛК: фоновую на этих этапах заменяет приоритетная (см. _join_sync)
+_LK_WAIT_PHASES = ("queued", "connect", "login")
+
+
+async def _sync_user_deadlines(
+    outbox: Outbox,
+    user_id: int,
+    interactive: bool,
+    report: Callable[[str], None]
+) -> Tuple[str, List[Dict]]:
+    """
+    Синхронизирует дедлайны пользователя с ЛК и уведомляет о новых, сообщая этапы работы в `report`.
+    Возвращает (итог, новые дедлайны), итог: 'ok', 'no_user', 'no_credentials', 'bad_key' (данные не расшифровываются)
+    или 'auth_failed'. Если ЛК не ответил, выбрасывает LkUnavailableError.
     """
     logger.info(f"Запуск задачи обновления дедлайнов пользователя {user_id}...")
 
     user = await get_user_by_telegram_id(user_id)
     if not user:
         logger.warning(f"Не удалось обновить дедлайны для пользователя {user_id} (пользователь не существует)")
-        return
+        return "no_user", []
 
     # Проверка, что у пользователя есть сохранённые учётные данные
     if not user.encrypted_login_lk or not user.encrypted_password_lk:
         logger.warning(f"Не удалось обновить дедлайны для пользователя {user.telegram_id} (нет сохранённых данных пользователя)")
-        return
+        return "no_credentials", []
 
     # Расшифровка данных
     try:
@@ -42,26 +148,39 @@ async def update_user_deadlines_and_notify(bot: Bot, user_id: int, force_notify:
             f"Не удалось расшифровать учётные данные пользователя {user.telegram_id}: "
             f"возможно текущий ENCRYPTION_KEY не соответствует ключу, которым данные были зашифрованы"
         )
-        if force_notify:
-            await bot.send_message(
-                chat_id=user.telegram_id,
-                text="⛔ Не удалось прочитать ваши сохранённые данные от личного кабинета — "
-                     "возникла проблема с ключом шифрования.\n\n"
-                     "🔑 Пожалуйста, пройдите регистрацию заново: команда /stop (удалит ваши данные), "
-                     "а затем /start."
-            )
-        return
+        return "bad_key", []
+
+    lk_cookies = _read_lk_cookies(user)
+
+    # Запуск парсера (только дедлайны: ФИО и ID профиля обновляются раз в семестр, см. refresh_all_profiles)
+    report("connect")
+    try:
+        parsed_data = await fetch_lk_deadlines(login, password, lk_cookies, interactive=interactive, on_phase=report)
+    except LkUnavailableError as e:
+        # Пропуск из-за разомкнутого предохранителя - не сбой этого пользователя, ЛК к нему даже не запрашивался
+        if e.reason != "circuit_open":
+            logger.error(f"Не удалось обновить дедлайны для пользователя {user.telegram_id}: ЛК не ответил ({e})")
+            await set_last_sync_error(user.telegram_id, e.reason)
+        raise
 
-    # Запуск парсера
-    loop = asyncio.get_event_loop()
-    parsed_data = await loop.run_in_executor(None, parse_lk_data, login, password)
     if parsed_data:
-        deadlines_from_parser, _, _ = parsed_data
+        deadlines_from_parser, new_lk_cookies = parsed_data
     else:
         logger.error(f"Не удалось обновить дедлайны для пользователя {user.telegram_id} (ошибка парсера)")
-        return
+        await set_last_sync_error(user.telegram_id, "auth_failed")
+        return "auth_failed", []
+
+    if new_lk_cookies != lk_cookies:
+        await set_lk_cookies(user.telegram_id, new_lk_cookies)
 
-    newly_added = await update_user_deadlines(user.telegram_id, deadlines_from_parser)
+    report("save")
+    # Список в ЛК не изменился с прошлой синхронизации - сверять с БД нечего
+    fingerprint = get_deadlines_fingerprint(deadlines_from_parser)
+    if fingerprint == user.deadlines_fingerprint:
+        await mark_deadlines_checked(user.telegram_id)
+        newly_added = []
+    else:
+        newly_added = await update_user_deadlines(user.telegram_id, deadlines_from_parser, fingerprint)
 
     if newly_added:
         # Если список не пустой, значит появились новые дедлайны
@@ -75,96 +194,374 @@ async def update_user_deadlines_and_notify(bot: Bot, user_id: int, force_notify:
                 f"🗓️ Срок сдачи: {d['due_date'].strftime('%d.%m.%Y')}\n\n"
             )
 
-        try:
-            await bot.send_message(
-                chat_id=user.telegram_id,
-                text=new_deadlines_text,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление о новых дедлайнах {user.telegram_id}. Ошибка: {e}")
+        # Ошибки доставки Outbox пишет в лог сам
+        outbox.send(
+            chat_id=user.telegram_id,
+            text=new_deadlines_text,
+            parse_mode="HTML",
+            interactive=interactive
+        )
     else:
         logger.info(f"Новых дедлайнов для пользователя {user.telegram_id} не найдено")
-        if force_notify:
-            await bot.send_message(
-                chat_id=user.telegram_id,
-                text="✅ Новых дедлайнов не найдено, всё по-прежнему!",
-                parse_mode="HTML"
-            )
-    
 
-async def update_all_deadlines(bot: Bot):
+    return "ok", newly_added
+
+
+def _join_sync(outbox: Outbox, user_id: int, interactive: bool) -> _SyncFlight:
     """
-    Задача для полного обновления дедлайнов и уведомления о новых.
+    Возвращает идущую синхронизацию пользователя или начинает новую.
+    Фоновая синхронизация, которая ещё ждёт ЛК, при запросе пользователя отменяется и начинается заново
+    приоритетной (резерв сеансов ЛК, вне очереди лимитера): её ожидающие переходят к новой.
     """
-    logger.info("Запуск задачи обновления дедлайнов всех пользователей...")
-    users = await get_all_users()
-    for user in users:
-        # Сбой у одного пользователя (недоступный ЛК, битые учётные данные) не должен прерывать обновление для всех остальных
+    flight = _syncs_in_flight.get(user_id)
+    if flight is not None and interactive and not flight.interactive and flight.current_phase in _LK_WAIT_PHASES:
+        logger.info(f"Фоновая синхронизация пользователя {user_id} заменена приоритетной")
+        flight.superseded = True
+        flight.retire()
+        flight.task.cancel()
+        flight = None
+
+    if flight is None or flight.task.cancelled():
+        flight = _SyncFlight(user_id, interactive)
+        flight.task = asyncio.create_task(
+            _sync_user_deadlines(outbox, user_id, interactive=interactive, report=flight.report)
+        )
+        _syncs_in_flight[user_id] = flight
+        flight.task.add_done_callback(lambda _: flight.retire())
+    else:
+        logger.info(f"Синхронизация пользователя {user_id} уже идёт, запрос присоединён к ней")
+    return flight
+
+
+async def update_user_deadlines_and_notify(
+    outbox: Outbox,
+    user_id: int,
+    progress: Optional[SyncProgress] = None
+):
+    """
+    Задача для обновления дедлайнов пользователя
+
+    Одновременные запросы синхронизации одного пользователя (повторные нажатия "Обновить", /update
+    во время фоновой синхронизации) не запускают новый парсинг ЛК, а дожидаются уже идущей синхронизации.
+    /update идёт в резерв сеансов ЛК и вне очереди лимитера, в том числе если присоединился к фоновой (см. _join_sync).
+
+    :param outbox: Очередь отправки уведомлений
+    :param user_id: ID пользователя
+    :param progress: Сообщение, в котором показываются этапы синхронизации и её итог
+        (запрос пользователя, который ждёт ответа; None - фоновая синхронизация)
+    """
+    interactive = progress is not None
+    while True:
+        flight = _join_sync(outbox, user_id, interactive=interactive)
+        if progress:
+            flight.attach(progress)
+        try:
+            status, newly_added = await flight.wait()
+        except asyncio.CancelledError:
+            # Синхронизацию заменила приоритетная - ждать нужно её (если не отменён сам этот запрос)
+            if flight.superseded and not asyncio.current_task().cancelling():
+                continue
+            raise
+        except LkUnavailableError:
+            # Фоновая синхронизация сама учитывает пропущенных пользователей (см. _run_for_users)
+            if not interactive:
+                raise
+            status, newly_added = "lk_unavailable", []
+        break
+
+    if not progress:
+        return
+    if status != "ok":
+        await progress.finish(UPDATE_RESULT_TEXTS[status])
+    elif newly_added:
+        await progress.finish(f"✨ Готово! Новых дедлайнов: {len(newly_added)}, список — ниже.")
+    else:
+        await progress.finish("✅ Новых дедлайнов не найдено, всё по-прежнему!")
+
+
+def is_user_update_running(user_id: int) -> bool:
+    """True, если пользователь уже ждёт запрошенного им обновления дедлайнов (фоновая синхронизация не считается)."""
+    return user_id in _user_updates
+
+
+def start_user_update(outbox: Outbox, progress: SyncProgress):
+    """
+    Запускает обновление дедлайнов по запросу пользователя в фоне и сразу возвращается:
+    хэндлеру не нужно ждать входа в ЛК и парсинга, ход и итог показываются в сообщении `progress`.
+    """
+    async def run():
         try:
-            await update_user_deadlines_and_notify(bot, user.telegram_id)
+            await update_user_deadlines_and_notify(outbox, progress.chat_id, progress=progress)
         except Exception as e:
-            logger.exception(f"Ошибка при обновлении дедлайнов пользователя {user.telegram_id}: {e}")
-        await asyncio.sleep(5)
-    
-    logger.success(f"Задача обновления дедлайнов для {len(users)} пользователей завершена")
+            logger.exception(f"Ошибка при обновлении дедлайнов пользователя {progress.chat_id}: {e}")
+            await progress.finish(UPDATE_RESULT_TEXTS["error"])
+
+    user_id = progress.chat_id
+    task = asyncio.create_task(run())
+    _user_updates[user_id] = task
+    task.add_done_callback(lambda _: _user_updates.pop(user_id, None))
+
+
+async def _run_for_users(users: list, job: Callable[[object], Awaitable], job_name: str):
+    """
+    Выполняет `job` для каждого пользователя силами SYNC_WORKERS параллельных воркеров.
+    На одного пользователя отводится не больше SYNC_USER_TIMEOUT секунд: зависший или медленный ЛК
+    одного аккаунта не задерживает всех, кто стоит в очереди после него.
+    Пока предохранитель ЛК разомкнут, оставшиеся пользователи пропускаются без обращения к ЛК.
+    Таймауты ЛК учитываются вместе с превышением SYNC_USER_TIMEOUT, прочие сбои ЛК - как ошибки.
+    """
+    started_at = time.monotonic()
+    queue = asyncio.Queue()
+    for user in users:
+        queue.put_nowait(user)
+
+    stats = {"completed": 0, "timed_out": 0, "failed": 0, "skipped": 0}
+
+    async def worker():
+        while not queue.empty():
+            user = queue.get_nowait()
+            if lk_circuit_breaker.is_open:
+                stats["skipped"] += 1
+                continue
+            try:
+                await asyncio.wait_for(job(user), timeout=SYNC_USER_TIMEOUT)
+                stats["completed"] += 1
+            except LkUnavailableError as e:
+                # Причина уже записана в БД задачей; здесь - только итоговая статистика
+                if e.reason == "circuit_open":
+                    stats["skipped"] += 1
+                elif e.reason == "timeout":
+                    stats["timed_out"] += 1
+                else:
+                    stats["failed"] += 1
+            except asyncio.TimeoutError:
+                stats["timed_out"] += 1
+                logger.error(f"{job_name}: пользователь {user.telegram_id} не обработан за {SYNC_USER_TIMEOUT} c")
+                await set_last_sync_error(user.telegram_id, "timeout")
+            # Сбой у одного пользователя (недоступный ЛК, битые учётные данные) не должен прерывать обработку остальных
+            except Exception as e:
+                stats["failed"] += 1
+                logger.exception(f"{job_name}: ошибка у пользователя {user.telegram_id}: {e}")
+
+    await asyncio.gather(*(worker() for _ in range(min(SYNC_WORKERS, len(users)))))
+
+    elapsed = time.monotonic() - started_at
+    logger.success(
+        f"{job_name}: завершено за {elapsed:.1f} c, обработано {stats['completed']} из {len(users)} пользователей "
+        f"(таймаут: {stats['timed_out']}, ошибки: {stats['failed']}, пропущено из-за недоступности ЛК: {stats['skipped']})"
+    )
+
+
+async def update_deadlines_slice(outbox: Outbox):
+    """
+    Задача для обновления дедлайнов очередной части пользователей и уведомления о новых.
+
+    Запускается каждые SYNC_SLICE_SECONDS секунд и обрабатывает пользователей, чьё смещение синхронизации
+    (sync_offset - постоянный хэш telegram_id) попало в прошедший с прошлого запуска отрезок часа,
+    а очередная синхронизация уже положена (next_sync_at, интервал от часа до нескольких - см. _sync_interval_hours).
+    Так каждый пользователь синхронизируется в одно и то же время часа, а нагрузка на ЛК, БД и Telegram
+    распределена по часу равномерно. Отрезок отсчитывается от прошлого запуска, поэтому задержанный
+    или пропущенный запуск не теряет пользователей - их заберёт следующий.
+    """
+    global _synced_up_to
+
+    now_offset = int(time.time()) % SYNC_PERIOD_SECONDS
+    previous_offset = _synced_up_to
+    if previous_offset is None:
+        previous_offset = int(now_offset - SYNC_SLICE_SECONDS) % SYNC_PERIOD_SECONDS
+    _synced_up_to = now_offset
+    if previous_offset == now_offset:
+        return
+
+    users = await get_users_in_sync_window(previous_offset, now_offset, datetime.now())
+    if not users:
+        return
+
+    logger.info(f"Запуск задачи обновления дедлайнов: {len(users)} пользователей (смещения {previous_offset}-{now_offset} c)")
+    await _run_for_users(
+        users,
+        lambda user: update_user_deadlines_and_notify(outbox, user.telegram_id),
+        "Обновление дедлайнов"
+    )
+
+
+async def refresh_user_profile(user):
+    """Обновляет ФИО и ID профиля ГУАП пользователя (страницы профиля и группы, без таблицы заданий)."""
+    if not user.encrypted_login_lk or not user.encrypted_password_lk:
+        return
+
+    try:
+        login = decrypt_data(user.encrypted_login_lk)
+        password = decrypt_data(user.encrypted_password_lk)
+    except InvalidToken:
+        # Без оповещения администратора на каждого такого пользователя: при смене ключа их может быть много
+        logger.warning(f"Профиль пользователя {user.telegram_id} не обновлён: учётные данные не расшифровываются")
+        return
+
+    lk_cookies = _read_lk_cookies(user)
+    parsed_data = await fetch_lk_profile(login, password, lk_cookies)
+    if not parsed_data:
+        logger.warning(f"Не удалось обновить профиль пользователя {user.telegram_id} (ошибка парсера)")
+        return
+
+    profile_id, full_name, new_lk_cookies = parsed_data
+    await set_user_profile(user.telegram_id, profile_id, full_name)
+    # Задача идёт параллельно с синхронизациями: сессия, которую успела сохранить синхронизация, новее этой
+    if new_lk_cookies != lk_cookies:
+        if not await replace_lk_cookies(user.telegram_id, user.encrypted_lk_cookies, new_lk_cookies):
+            logger.info(f"Сессия ЛК пользователя {user.telegram_id} обновлена синхронизацией, сессия профиля не сохранена")
+
+
+async def refresh_all_profiles():
+    """
+    Задача для обновления ФИО и ID профиля ГУАП всех пользователей.
+    Плановая синхронизация их не загружает (страница группы - самая тяжёлая), поэтому они
+    обновляются при регистрации и раз в семестр этой задачей.
+    """
+    logger.info("Запуск задачи обновления профилей всех пользователей...")
+    users = await get_all_users()
+    await _run_for_users(users, refresh_user_profile, "Обновление профилей")
+
 
+def _owed_day_offset(notification_days: str, days_left: int) -> Optional[int]:
+    """
+    Возвращает порог "за сколько дней" из настроек пользователя, напоминание по которому положено сейчас:
+    наименьший из порогов, не меньших `days_left` (последний пройденный). None - ни один порог ещё не наступил.
+    """
+    return min((day for day in map(int, notification_days.split(',')) if day >= days_left), default=None)
 
-async def send_deadline_notifications(bot: Bot):
+
+def _daily_slot_delay(slot: datetime, now: datetime) -> Optional[int]:
+    """
+    Возвращает, на сколько дней опоздал первый ежедневный отрезок (REMINDER_DAILY_HOUR:00), начиная с наступившего
+    времени напоминания `slot`: 0 - он пришёлся на сегодня, больше 0 - он пропущен, пока бот был выключен.
+    None - ежедневное напоминание ещё не положено.
+    """
+    daily_slot = slot.replace(hour=REMINDER_DAILY_HOUR, minute=0, second=0, microsecond=0)
+    if daily_slot < slot:
+        daily_slot += timedelta(days=1)
+    if daily_slot > now:
+        return None
+    return (now.date() - daily_slot.date()).days
+
+
+async def send_deadline_notifications(outbox: Outbox):
     """
     Задача для отправки уведомлений о дедлайнах с учётом настроек пользователя.
+
+    Запускается каждую минуту, но обрабатывает только пользователей, чьё время напоминания
+    (users.next_reminder_at) наступило: наступивший момент определяет, какие напоминания положены -
+    ежедневные (в REMINDER_DAILY_HOUR:00) и/или частые (в часы, кратные интервалу).
+    Если бот был выключен, пропущенное время обрабатывается при первом запуске (одно напоминание, без повторов);
+    рассылка, прерванная падением бота, повторяется через REMINDER_CLAIM_TIMEOUT_MINUTES.
+
+    Ежедневные напоминания сверяются с журналом sent_reminders: каждое уходит один раз в день, когда наступил
+    порог. Напоминание по порогу, пройденному, пока бот был выключен, досылается, если опоздание не больше
+    REMINDER_CATCHUP_DAYS; новый дедлайн, уже прошедший порог, напоминания по нему не получает. Все положенные пользователю за запуск
+    ежедневные напоминания собираются в одно сообщение.
+    Сообщения уходят через очередь Outbox с соблюдением лимитов Telegram.
     """
-    logger.info("Запуск задачи отправки уведомлений о дедлайнах")
-    current_hour = datetime.now().hour
+    now = datetime.now()
+    today = now.date()
+
+    claimed_users = await claim_due_reminders(now)
+    # Пользователи без рассчитанного времени (только что зарегистрированные) лишь получают его
+    due_users = [user for user in claimed_users if user['slot'] is not None]
+    if not due_users:
+        await complete_reminder_claims([user['id'] for user in claimed_users], now)
+        return
+    logger.info(f"Запуск задачи отправки уведомлений о дедлайнах для {len(due_users)} пользователей")
 
-    # Поиск только тех пользователей, кто хочет получать уведомления
-    users_to_notify = await get_all_users(only_with_notifications=True)
+    # Пары (ожидание доставки, записи для журнала)
+    deliveries = []
 
-    for user in users_to_notify:
-        notification_sent_this_run = False
-        user_deadlines = await get_user_deadlines_from_db(user.telegram_id)
-        if not user_deadlines:
-            continue
+    for batch_start in range(0, len(due_users), REMINDER_BATCH_SIZE):
+        batch = due_users[batch_start:batch_start + REMINDER_BATCH_SIZE]
+        # Опоздание ежедневного напоминания по пользователям, которым оно положено: telegram_id -> дней
+        daily_delays: Dict[int, int] = {}
+        daily_user_ids = []
+        for user in batch:
+            delay = _daily_slot_delay(user['slot'], now) if user['notification_days'] else None
+            if delay is not None:
+                daily_delays[user['telegram_id']] = delay
+                daily_user_ids.append(user['id'])
+        interval_user_ids = [
+            user['id'] for user in batch
+            if user['notification_interval_hours'] > 0 and user['slot'].hour % user['notification_interval_hours'] == 0
+        ]
+        # Положенные ежедневные напоминания: telegram_id -> [(дедлайн, порог), ...]
+        owed_reminders: Dict[int, List[Tuple[Dict, int]]] = {}
 
         # Логика для ежедневных уведомлений
-        if user.notification_days and current_hour == 9:  # Отправка ежедневных в 9:00
-            notification_days_set = set(map(int, user.notification_days.split(',')))
-            today = datetime.now().date()
-            for deadline in user_deadlines:
-                days_left = (deadline.due_date.date() - today).days
-                if days_left in notification_days_set:
-                    text = (
-                        f"🔔 <b>Напоминание о дедлайне!</b>\n\n"
-                        f"📚 <b>Предмет:</b> {deadline.course_name}\n"
-                        f"📝 <b>Задание:</b> {deadline.task_name}\n\n"
-                        f"🗓️ <u>Осталось дней</u>: <b>{days_left}</b>"
+        for deadline in await get_daily_reminder_candidates(today, daily_user_ids) if daily_user_ids else []:
+            days_left = deadline['days_left']
+            day_offset = _owed_day_offset(deadline['notification_days'], days_left)
+            if day_offset is None:
+                continue
+            # Напоминание по этому (или более позднему) порогу уже отправлялось
+            if deadline['last_offset'] is not None and day_offset >= deadline['last_offset']:
+                continue
+            # Порог пройден не сегодня: досылается, только если он пришёлся на простой бота и тот был недавно
+            if day_offset - days_left > min(daily_delays[deadline['telegram_id']], REMINDER_CATCHUP_DAYS):
+                continue
+
+            owed_reminders.setdefault(deadline['telegram_id'], []).append((deadline, day_offset))
+
+        # Одно сообщение на пользователя, в журнал - каждый напомненный дедлайн
+        for telegram_id, reminders in owed_reminders.items():
+            if len(reminders) == 1:
+                deadline, _ = reminders[0]
+                text = (
+                    f"🔔 <b>Напоминание о дедлайне!</b>\n\n"
+                    f"📚 <b>Предмет:</b> {deadline['course_name']}\n"
+                    f"📝 <b>Задание:</b> {deadline['task_name']}\n\n"
+                    f"🗓️ <u>Осталось дней</u>: <b>{deadline['days_left']}</b>"
+                )
+            else:
+                text = "🔔 <b>Напоминание о дедлайнах!</b>\n\n"
+                for deadline, _ in sorted(reminders, key=lambda reminder: reminder[0]['days_left']):
+                    text += (
+                        f"📚 <b>{deadline['course_name']}</b>\n"
+                        f"📝 {deadline['task_name']}\n"
+                        f"🗓️ <u>Осталось дней</u>: <b>{deadline['days_left']}</b>\n\n"
                     )
-                    try:
-                        await bot.send_message(chat_id=user.telegram_id, text=text, parse_mode="HTML")
-                        logger.success(f"Отправлено ЕЖЕДНЕВНОЕ уведомление пользователю {user.telegram_id}.")
-                        notification_sent_this_run = True
-                        break  # Отправка только одного ежедневного уведомления за раз
-                    except Exception as e:
-                        logger.error(f"Не удалось отправить уведомление {user.telegram_id}. Ошибка: {e}")
-
-        # Логика для частых (часовых) уведомлений
-        interval = user.notification_interval_hours
-        if interval > 0 and current_hour % interval == 0 and not notification_sent_this_run:
+            delivery = outbox.send(chat_id=telegram_id, text=text, parse_mode="HTML")
+            deliveries.append((
+                delivery,
+                [(deadline['deadline_id'], 'daily', day_offset) for deadline, day_offset in reminders]
+            ))
+
+        # Логика для частых (часовых) уведомлений - только тем, кому в этот запуск не ушло ежедневное
+        for user in await get_interval_reminder_candidates(interval_user_ids) if interval_user_ids else []:
+            if user['telegram_id'] in owed_reminders:
+                continue
             deadlines_text = "⏰ <b>Часовое напоминание!</b>\n\nВаши активные дедлайны:\n\n"
-            for d in user_deadlines:
-                deadlines_text += f"▪️ {d.course_name}: {d.task_name} (до {d.due_date.strftime('%d.%m')})\n"
-            try:
-                await bot.send_message(chat_id=user.telegram_id, text=deadlines_text, parse_mode="HTML")
-                logger.success(f"Отправлено ЧАСТОЕ уведомление пользователю {user.telegram_id}")
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление {user.telegram_id}. Ошибка: {e}")
+            for d in user['deadlines']:
+                deadlines_text += f"▪️ {d['course_name']}: {d['task_name']} (до {d['due_date'].strftime('%d.%m')})\n"
+            delivery = outbox.send(chat_id=user['telegram_id'], text=deadlines_text, parse_mode="HTML")
+            deliveries.append((delivery, []))
 
-        await asyncio.sleep(1)
-    logger.success("Задача отправки уведомлений завершена")
+    logger.info(f"Уведомлений в очереди на отправку: {len(deliveries)} (всего в очереди: {outbox.qsize})")
+    results = await asyncio.gather(*(delivery for delivery, _ in deliveries))
+
+    # В журнал попадают только доставленные напоминания: недоставленное может быть дослано в следующий раз
+    await record_sent_reminders([
+        reminder for (_, reminders), message in zip(deliveries, results) if message is not None
+        for reminder in reminders
+    ])
+    # Время напоминания переносится только после рассылки: если бот упадёт раньше, пользователи будут выбраны снова
+    await complete_reminder_claims([user['id'] for user in claimed_users], now)
+    sent = sum(message is not None for message in results)
+    logger.success(f"Задача отправки уведомлений завершена: доставлено {sent} из {len(deliveries)}")
 
 
 async def cleanup_expired_trashed_deadlines_task():
-    """Задача для автоматической очистки просроченных дедлайнов из корзин."""
+    """
+    Задача для автоматической очистки просроченных дедлайнов из корзин, журнала напоминаний
+    и состояний диалогов, брошенных дольше FSM_STATE_TTL_HOURS назад.
+    """
     logger.info("Запуск задачи очистки просроченных дедлайнов из корзин...")
     await cleanup_expired_trashed_deadlines()
+    await cleanup_sent_reminders()
+    await cleanup_stale_fsm_states(datetime.now() - timedelta(hours=FSM_STATE_TTL_HOURS))
     logger.success("Задача очистки просроченных дедлайнов завершена.")
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import time
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш "ключ - значение" с временем жизни записей.
+
+    Хранит не больше `maxsize` записей: при переполнении вытесняется та, к которой дольше всего
+    не обращались (LRU). Запись старше `ttl` секунд считается отсутствующей.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Ключ -> (момент записи, значение); порядок - от давно использованных к недавним
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает значение по ключу или None, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Сохраняет значение, вытесняя давно не использованные записи при переполнении."""
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        """Удаляет записи по ключам (отсутствующие ключи пропускаются)."""
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Удаляет все записи."""
+        self._data.clear()
@@ -0,0 +1,78 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Optional, TypeVar
+
+from loguru import logger
+
+from src.config import PARSE_EXECUTOR, PARSE_WORKERS
+
+import asyncio
+
+T = TypeVar("T")
+
+_parse_executor: Optional[Executor] = None
+
+
+def _get_parse_executor() -> Executor:
+    """Создаёт пул для разбора HTML при первом обращении (размер и тип - из PARSE_WORKERS и PARSE_EXECUTOR)."""
+    global _parse_executor
+    if _parse_executor is None:
+        if PARSE_EXECUTOR == "process":
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        else:
+            _parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="lk-parser")
+        logger.info(f"Создан пул разбора HTML: {PARSE_EXECUTOR}, воркеров: {PARSE_WORKERS}")
+    return _parse_executor
+
+
+async def run_parser(func: Callable[..., T], *args) -> T:
+    """
+    Выполняет разбор страницы `func(*args)` в отдельном пуле, не блокируя event loop.
+    Для пула процессов `func` и аргументы должны быть picklable (функция уровня модуля и строки).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_parse_executor(), func, *args)
+
+
+def shutdown_parse_executor():
+    """Останавливает пул разбора HTML (при завершении бота)."""
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+
+class SlotPool:
+    """
+    Ограничитель числа одновременных операций с резервом для интерактивных запросов.
+
+    Фоновые операции занимают не больше `size - reserved` слотов, интерактивные - любые свободные:
+    даже при полной загрузке фоновой синхронизацией для пользователя, который ждёт ответа бота,
+    всегда остаётся `reserved` слотов.
+    """
+
+    def __init__(self, size: int, reserved: int):
+        if not 0 <= reserved < size:
+            raise ValueError("Резерв должен быть неотрицательным и меньше размера пула")
+        self.size = size
+        self.reserved = reserved
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @asynccontextmanager
+    async def slot(self, interactive: bool = False):
+        """Занимает слот на время блока `async with`; фоновые операции ждут, пока свободных больше резерва."""
+        limit = self.size if interactive else self.size - self.reserved
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_use < limit)
+            self._in_use += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_use -= 1
+                self._condition.notify_all()
@@ -0,0 +1,142 @@
+from loguru import logger
+
+import asyncio
+import time
+from typing import Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму "token bucket": в среднем не больше `rate` операций в секунду,
+    короткие всплески - до `capacity` операций подряд.
+    Приоритетные операции (acquire(priority=True)) получают токены раньше всех остальных ожидающих.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        # Ожидающие обслуживаются по очереди (FIFO), пока первый из них ждёт свой токен
+        self._lock = asyncio.Lock()
+        # Сколько приоритетных операций ждёт токен: пока они есть, общая очередь не забирает токены
+        self._priority_waiters = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, priority: bool = False):
+        """
+        Ждёт, пока в "ведре" появится токен, и забирает его.
+        priority=True - в обход общей очереди: первый же появившийся токен достаётся приоритетной операции.
+        """
+        if priority:
+            self._priority_waiters += 1
+            try:
+                self._refill()
+                while self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+            finally:
+                self._priority_waiters -= 1
+            return
+
+        async with self._lock:
+            self._refill()
+            # Пока ждут приоритетные операции, токены достаются им
+            while self._tokens < 1 or self._priority_waiters:
+                await asyncio.sleep((1 - self._tokens if self._tokens < 1 else 1) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+# Пропуск запроса, выданный предохранителем: (поколение - число размыканий к началу запроса, пробный ли запрос)
+BreakerTicket = Tuple[int, bool]
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса.
+
+    После `failure_threshold` сбоев подряд "размыкается" и на `cooldown` секунд отклоняет все запросы.
+    Затем пропускает один пробный запрос: успех снова "замыкает" цепь, сбой - продлевает паузу.
+
+    Каждый запрос получает пропуск (before_request) и сообщает итог с ним. Итоги запросов, начатых
+    до последнего размыкания, не учитываются: опоздавший успех не замыкает цепь, а опоздавший сбой
+    не считается повторно. Освободить место пробного запроса может только он сам.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._generation = 0
+        self._opened_at: float | None = None
+        self._probe_started_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        """True, если запросы сейчас отклоняются (пауза не истекла или пробный запрос ещё выполняется)."""
+        if self._opened_at is None:
+            return False
+        now = time.monotonic()
+        if now - self._opened_at < self.cooldown:
+            return True
+        # Пробный запрос, который не завершился за время паузы, считается потерянным
+        return self._probe_started_at is not None and now - self._probe_started_at < self.cooldown
+
+    def before_request(self) -> Optional[BreakerTicket]:
+        """Возвращает пропуск для запроса или None, если запрос выполнять нельзя; после паузы пропускает ровно один пробный."""
+        if self.is_open:
+            return None
+        if self._opened_at is not None:
+            self._probe_started_at = time.monotonic()
+            logger.info(f"{self.name}: пауза истекла, выполняется пробный запрос")
+            return self._generation, True
+        return self._generation, False
+
+    def _is_current(self, ticket: BreakerTicket) -> bool:
+        generation, probe = ticket
+        # Пока цепь разомкнута, учитывается только пробный запрос
+        return generation == self._generation and (probe or self._opened_at is None)
+
+    def record_success(self, ticket: BreakerTicket):
+        if not self._is_current(ticket):
+            return
+        if self._opened_at is not None:
+            logger.success(f"{self.name}: сервис снова отвечает, запросы возобновлены")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+
+    def record_cancelled(self, ticket: BreakerTicket):
+        """
+        Запрос отменён вызывающим (бросили ожидание, остановка бота) - это не сбой сервиса.
+        Если отменён пробный запрос, следующий запрос сможет стать пробным.
+        """
+        if self._is_current(ticket) and ticket[1]:
+            self._probe_started_at = None
+
+    def record_failure(self, ticket: BreakerTicket):
+        if not self._is_current(ticket):
+            return
+        if self._opened_at is not None:
+            # Сбой пробного запроса - пауза начинается заново (без повторного сообщения об ошибке)
+            self._generation += 1
+            self._opened_at = time.monotonic()
+            self._probe_started_at = None
+            logger.warning(f"{self.name}: пробный запрос не удался, пауза продлена на {self.cooldown:.0f} c")
+            return
+
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._generation += 1
+            self._opened_at = time.monotonic()
+            # Одно сообщение администратору на всю серию сбоев вместо ошибки на каждый запрос
+            logger.error(
+                f"{self.name}: {self._failures} сбоев подряд, запросы приостановлены на {self.cooldown:.0f} c"
+            )